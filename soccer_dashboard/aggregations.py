@@ -0,0 +1,436 @@
+import pandas as pd
+
+# The pandas aggregations the app runs when SQL_ENGINE is "pandas", kept
+# apart from app.py so sql_engine's DuckDB versions can be checked against
+# them (tests/test_sql_engine.py)
+
+# Groups the shot profiles are built for
+PLAYER_SHOT_KEYS = ["player", "team", "position"]
+ASSIST_SHOT_KEYS = ["assist_player", "team"]
+
+
+def team_match_totals(df):
+    """
+    Per team and season totals of the team_stats matches, stacking each
+    match's home and away rows.
+    """
+    # Home DataFrame
+    home_df = df[
+        [
+            "season_id",
+            "home_team",
+            "home_points",
+            "home_expected_points",
+            "home_goals",
+            "home_xg",
+            "home_np_xg",
+            "home_np_xg_difference",
+            "away_goals",
+            "home_ppda",
+            "away_ppda",
+            "home_deep_completions",
+            "away_deep_completions",
+        ]
+    ].rename(
+        columns={
+            "home_team": "team",
+            "home_points": "points",
+            "home_expected_points": "xPoints",
+            "home_goals": "goals",
+            "away_goals": "GA",
+            "home_xg": "xG",
+            "home_np_xg": "npxG",
+            "home_np_xg_difference": "npxGD",
+            "home_ppda": "ppda",
+            "away_ppda": "ppda_against",
+            "home_deep_completions": "deep_completions",
+            "away_deep_completions": "deep_completions_allowed",
+        }
+    )
+
+    # Away DataFrame
+    away_df = df[
+        [
+            "season_id",
+            "away_team",
+            "away_points",
+            "away_expected_points",
+            "away_goals",
+            "away_xg",
+            "away_np_xg",
+            "away_np_xg_difference",
+            "home_goals",
+            "away_ppda",
+            "home_ppda",
+            "away_deep_completions",
+            "home_deep_completions",
+        ]
+    ].rename(
+        columns={
+            "away_team": "team",
+            "away_points": "points",
+            "away_expected_points": "xPoints",
+            "away_goals": "goals",
+            "home_goals": "GA",
+            "away_xg": "xG",
+            "away_np_xg": "npxG",
+            "away_np_xg_difference": "npxGD",
+            "away_ppda": "ppda",
+            "home_ppda": "ppda_against",
+            "away_deep_completions": "deep_completions",
+            "home_deep_completions": "deep_completions_allowed",
+        }
+    )
+
+    # Concatenate DataFrames
+    team_df = pd.concat([home_df, away_df], ignore_index=True)
+
+    # Aggregate team_df by team and season
+    agg_funcs = {
+        "points": "sum",
+        "xPoints": "sum",
+        "goals": "sum",
+        "GA": "sum",
+        "xG": "sum",
+        "npxG": "sum",
+        "npxGD": "sum",
+        "ppda": "mean",
+        "ppda_against": "mean",
+        "deep_completions": "sum",
+        "deep_completions_allowed": "sum",
+    }
+
+    return team_df.groupby(["team", "season_id"]).agg(agg_funcs).reset_index()
+
+
+def team_season_summary(df_players_summary):
+    # Groupby team df_players_summary by team and season
+    return df_players_summary.groupby(
+        ["team", "season_id"], as_index=False, observed=True
+    ).sum(numeric_only=True)
+
+
+def player_shot_profiles(df_shots):
+    """
+    Per shot xG of each player and of each team, broken down by situation,
+    body part, zone and result.
+    """
+    # Calculate the total xG, the count of shots, and the count of unique games for each group
+    grouped_data = (
+        df_shots.groupby(
+            ["player", "team", "position", "situation", "body_part", "zone_y", "result"],
+            observed=True,
+        )
+        .agg(
+            total_xg=pd.NamedAgg(column="xg", aggfunc="sum"),
+            shot_count=pd.NamedAgg(column="xg", aggfunc="count"),
+        )
+        .reset_index()
+    )
+
+    # Calculate matches per player, team, and position
+    matches_data = (
+        df_shots.groupby(["player", "team", "position"], observed=True)
+        .agg(matches=pd.NamedAgg(column="game", aggfunc="nunique"))
+        .reset_index()
+    )
+
+    # Calculate the per shot xG
+    grouped_data["per_shot_xg"] = grouped_data["total_xg"] / grouped_data["shot_count"]
+
+    # Pivot the data for situations
+    situation_pivot = grouped_data.pivot_table(
+        index=["player", "team", "position"],
+        columns="situation",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    situation_pivot.columns = [f"{col} xG" for col in situation_pivot.columns]
+    situation_pivot.reset_index(inplace=True)
+
+    # Pivot the data for body parts
+    body_part_pivot = grouped_data.pivot_table(
+        index=["player", "team", "position"],
+        columns="body_part",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    body_part_pivot.columns = [f"{col} xG" for col in body_part_pivot.columns]
+    body_part_pivot.reset_index(inplace=True)
+
+    # Pivot the data for zone_y
+    zone_y_pivot = grouped_data.pivot_table(
+        index=["player", "team", "position"],
+        columns="zone_y",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    zone_y_pivot.columns = [f"{col} xG" for col in zone_y_pivot.columns]
+    zone_y_pivot.reset_index(inplace=True)
+
+    # Pivot the data for result
+    result_pivot = grouped_data.pivot_table(
+        index=["player", "team", "position"],
+        columns="result",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    result_pivot.columns = [f"{col} xG" for col in result_pivot.columns]
+    result_pivot.reset_index(inplace=True)
+
+    # Merge the pivot tables on player, team, and position
+    playerwise_result = situation_pivot.merge(
+        body_part_pivot, on=["player", "team", "position"], how="outer"
+    )
+    playerwise_result = playerwise_result.merge(
+        zone_y_pivot, on=["player", "team", "position"], how="outer"
+    )
+
+    # Merge the result_pivot with playerwise_result
+    playerwise_result = playerwise_result.merge(
+        result_pivot, on=["player", "team", "position"], how="outer"
+    )
+
+    # Add matches to the playerwise_result
+    playerwise_result = playerwise_result.merge(
+        matches_data, on=["player", "team", "position"], how="left"
+    )
+
+    # Calculate teamwise data
+    team_grouped_data = (
+        df_shots.groupby(
+            ["team", "situation", "body_part", "zone_y", "result"], observed=True
+        )
+        .agg(
+            total_xg=pd.NamedAgg(column="xg", aggfunc="sum"),
+            shot_count=pd.NamedAgg(column="xg", aggfunc="count"),
+        )
+        .reset_index()
+    )
+
+    # Calculate the per shot xG
+    team_grouped_data["per_shot_xg"] = (
+        team_grouped_data["total_xg"] / team_grouped_data["shot_count"]
+    )
+
+    # Pivot the data for situations
+    team_situation_pivot = team_grouped_data.pivot_table(
+        index=["team"],
+        columns="situation",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    team_situation_pivot.columns = [f"{col} xG" for col in team_situation_pivot.columns]
+    team_situation_pivot.reset_index(inplace=True)
+
+    # Pivot the data for body parts
+    team_body_part_pivot = team_grouped_data.pivot_table(
+        index=["team"],
+        columns="body_part",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    team_body_part_pivot.columns = [f"{col} xG" for col in team_body_part_pivot.columns]
+    team_body_part_pivot.reset_index(inplace=True)
+
+    # Pivot the data for zone_y
+    team_zone_y_pivot = team_grouped_data.pivot_table(
+        index=["team"],
+        columns="zone_y",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    team_zone_y_pivot.columns = [f"{col} xG" for col in team_zone_y_pivot.columns]
+    team_zone_y_pivot.reset_index(inplace=True)
+
+    # Pivot the data for result
+    team_result_pivot = team_grouped_data.pivot_table(
+        index=["team"],
+        columns="result",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    team_result_pivot.columns = [f"{col} xG" for col in team_result_pivot.columns]
+    team_result_pivot.reset_index(inplace=True)
+
+    # Merge the pivot tables on team
+    teamwise_result = team_situation_pivot.merge(
+        team_body_part_pivot, on="team", how="outer"
+    )
+    teamwise_result = teamwise_result.merge(team_zone_y_pivot, on="team", how="outer")
+
+    # Merge the result_pivot with teamwise_result
+    teamwise_result = teamwise_result.merge(team_result_pivot, on="team", how="outer")
+
+    return playerwise_result, teamwise_result
+
+
+def assist_shot_profiles(df_shots):
+    """
+    Per shot xG of the shots each player assisted and of each team, broken
+    down by situation, body part, zone and result.
+    """
+    # Calculate the total xG, the count of shots, and the count of unique games for each group
+    grouped_data = (
+        df_shots.groupby(
+            ["assist_player", "team", "situation", "body_part", "zone_y", "result"],
+            observed=True,
+        )
+        .agg(
+            total_xg=pd.NamedAgg(column="xg", aggfunc="sum"),
+            shot_count=pd.NamedAgg(column="xg", aggfunc="count"),
+        )
+        .reset_index()
+    )
+
+    # Calculate matches per assist_player and team
+    matches_data = (
+        df_shots.groupby(["assist_player", "team"], observed=True)
+        .agg(matches=pd.NamedAgg(column="game", aggfunc="nunique"))
+        .reset_index()
+    )
+
+    # Calculate the per shot xG
+    grouped_data["per_shot_xg"] = grouped_data["total_xg"] / grouped_data["shot_count"]
+
+    # Pivot the data for situations
+    situation_pivot = grouped_data.pivot_table(
+        index=["assist_player", "team"],
+        columns="situation",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    situation_pivot.columns = [f"{col} xG" for col in situation_pivot.columns]
+    situation_pivot.reset_index(inplace=True)
+
+    # Pivot the data for body parts
+    body_part_pivot = grouped_data.pivot_table(
+        index=["assist_player", "team"],
+        columns="body_part",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    body_part_pivot.columns = [f"{col} xG" for col in body_part_pivot.columns]
+    body_part_pivot.reset_index(inplace=True)
+
+    # Pivot the data for zone_y
+    zone_y_pivot = grouped_data.pivot_table(
+        index=["assist_player", "team"],
+        columns="zone_y",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    zone_y_pivot.columns = [f"{col} xG" for col in zone_y_pivot.columns]
+    zone_y_pivot.reset_index(inplace=True)
+
+    # Pivot the data for result
+    result_pivot = grouped_data.pivot_table(
+        index=["assist_player", "team"],
+        columns="result",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    result_pivot.columns = [f"{col} xG" for col in result_pivot.columns]
+    result_pivot.reset_index(inplace=True)
+
+    # Merge the pivot tables on assist_player and team
+    assistwise_result = situation_pivot.merge(
+        body_part_pivot, on=["assist_player", "team"], how="outer"
+    )
+    assistwise_result = assistwise_result.merge(
+        zone_y_pivot, on=["assist_player", "team"], how="outer"
+    )
+
+    # Merge the result_pivot with assistwise_result
+    assistwise_result = assistwise_result.merge(
+        result_pivot, on=["assist_player", "team"], how="outer"
+    )
+
+    # Add matches to the assistwise_result
+    assistwise_result = assistwise_result.merge(
+        matches_data, on=["assist_player", "team"], how="left"
+    )
+
+    # Calculate teamwise data
+    team_grouped_data = (
+        df_shots.groupby(
+            ["team", "situation", "body_part", "zone_y", "result"], observed=True
+        )
+        .agg(
+            total_xg=pd.NamedAgg(column="xg", aggfunc="sum"),
+            shot_count=pd.NamedAgg(column="xg", aggfunc="count"),
+        )
+        .reset_index()
+    )
+
+    # Calculate the per shot xG
+    team_grouped_data["per_shot_xg"] = (
+        team_grouped_data["total_xg"] / team_grouped_data["shot_count"]
+    )
+
+    # Pivot the data for situations
+    team_situation_pivot = team_grouped_data.pivot_table(
+        index=["team"],
+        columns="situation",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    team_situation_pivot.columns = [f"{col} xG" for col in team_situation_pivot.columns]
+    team_situation_pivot.reset_index(inplace=True)
+
+    # Pivot the data for body parts
+    team_body_part_pivot = team_grouped_data.pivot_table(
+        index=["team"],
+        columns="body_part",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    team_body_part_pivot.columns = [f"{col} xG" for col in team_body_part_pivot.columns]
+    team_body_part_pivot.reset_index(inplace=True)
+
+    # Pivot the data for zone_y
+    team_zone_y_pivot = team_grouped_data.pivot_table(
+        index=["team"],
+        columns="zone_y",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    team_zone_y_pivot.columns = [f"{col} xG" for col in team_zone_y_pivot.columns]
+    team_zone_y_pivot.reset_index(inplace=True)
+
+    # Pivot the data for result
+    team_result_pivot = team_grouped_data.pivot_table(
+        index=["team"],
+        columns="result",
+        values="per_shot_xg",
+        fill_value=0,
+        observed=True,
+    )
+    team_result_pivot.columns = [f"{col} xG" for col in team_result_pivot.columns]
+    team_result_pivot.reset_index(inplace=True)
+
+    # Merge the pivot tables on team
+    teamwise_result = team_situation_pivot.merge(
+        team_body_part_pivot, on="team", how="outer"
+    )
+    teamwise_result = teamwise_result.merge(team_zone_y_pivot, on="team", how="outer")
+
+    # Merge the result_pivot with teamwise_result
+    teamwise_result = teamwise_result.merge(team_result_pivot, on="team", how="outer")
+
+    return assistwise_result, teamwise_result
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+import time
+
+from data_store import SNAPSHOT_DIR, get_data_path
+
+# SQLite file the API responses are kept in, inside the snapshot folder
+CACHE_FILE = "api_cache.sqlite"
+
+# Seconds a response's last use may lag by. Eviction only needs a rough
+# order, so most hits are plain reads rather than a write transaction.
+ACCESS_RESOLUTION = 60
+
+_connection = None
+_lock = threading.Lock()
+
+
+def cache_path(base_path=None):
+    return os.path.join(base_path or get_data_path(), SNAPSHOT_DIR, CACHE_FILE)
+
+
+def get_connection():
+    global _connection
+    if _connection is None:
+        path = cache_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared by every thread, each use holds _lock
+        _connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets other processes (replicas, the warmer) read while one writes
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, body BLOB, etag TEXT, last_modified TEXT, "
+            "fetched_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        # When each cache warmer job last finished, shared by every process
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS warmed (job TEXT PRIMARY KEY, at REAL)"
+        )
+    return _connection
+
+
+def lookup(url):
+    """
+    The cached response for a URL as (body, etag, last_modified, fetched_at),
+    or None. Marks it as recently used, at most once per ACCESS_RESOLUTION.
+    """
+    with _lock:
+        conn = get_connection()
+        row = conn.execute(
+            "SELECT body, etag, last_modified, fetched_at, accessed_at "
+            "FROM responses WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[4] >= ACCESS_RESOLUTION:
+            with conn:
+                conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url)
+                )
+    return row[:4]
+
+
+def store(url, body, etag=None, last_modified=None, max_bytes=None):
+    now = time.time()
+    with _lock, get_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, body, etag, last_modified, now, now, len(body)),
+        )
+        if max_bytes is not None:
+            evict(conn, max_bytes)
+
+
+def mark_fresh(url):
+    # A 304 revalidation: the cached body is current again
+    with _lock, get_connection() as conn:
+        conn.execute(
+            "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+            (time.time(), time.time(), url),
+        )
+
+
+def evict(conn, max_bytes):
+    # Drop the least recently used responses until the total fits
+    total = conn.execute("SELECT coalesce(sum(size), 0) FROM responses").fetchone()[0]
+    if total <= max_bytes:
+        return
+    rows = conn.execute(
+        "SELECT url, size FROM responses ORDER BY accessed_at"
+    ).fetchall()
+    for url, size in rows:
+        conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def last_warmed(job):
+    # Time the job last finished, or 0 if it never has
+    with _lock:
+        row = get_connection().execute(
+            "SELECT at FROM warmed WHERE job = ?", (job,)
+        ).fetchone()
+    return row[0] if row else 0
+
+
+def record_warmed(job):
+    with _lock, get_connection() as conn:
+        conn.execute("INSERT OR REPLACE INTO warmed VALUES (?, ?)", (job, time.time()))
+
+
+def entries(prefix=""):
+    # (url, body) of every cached response whose URL starts with prefix
+    with _lock:
+        rows = get_connection().execute("SELECT url, body FROM responses").fetchall()
+    return [(url, body) for url, body in rows if url.startswith(prefix)]
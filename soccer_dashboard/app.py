@@ -1,16 +1,13 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import requests
 import numpy as np
 import seaborn as sns
 import matplotlib.colors as mcolors
-from unidecode import unidecode
 from jinja2 import Environment, ChoiceLoader, FileSystemLoader
 from IPython.display import HTML
 from streamlit_extras.add_vertical_space import add_vertical_space
 from pandas.io.formats.style import Styler
-import os
 import altair as alt
 import logging
 from mplsoccer import FontManager
@@ -18,15 +15,43 @@ from mplsoccer import FontManager
 
 import urllib.error
 from config import (
-    API_KEY,
     EPL_ID,
     EFL_CHAMPIONSHIP_ID,
     EFL_LEAGUE_ONE_ID,
     SEASON,
+    API_REFRESH_INTERVALS,
+    WAGES_CURRENCY,
     fm_rubik,
 
     FenomenSans,
 )
+from data_store import SEASON_MONTHS, available_seasons
+from data_access import (
+    load_team_summary,
+    load_team_stats_range,
+    load_player_wages,
+    load_xT,
+    load_player_name_index,
+    select_dataset,
+    distinct_values,
+    use_duckdb,
+    run_loaders,
+    start_watcher,
+    database_healthy,
+)
+from assets import BADGE_SIZE, PLAYER_SIZE, localise, localise_map
+from cache_warmer import start_warmer
+from names import key_by_id, name_key, name_keys, transliterate_names
+from sportsdb_client import fetch_all, fetch_json
+from aggregations import (
+    ASSIST_SHOT_KEYS,
+    PLAYER_SHOT_KEYS,
+    assist_shot_profiles,
+    player_shot_profiles,
+    team_match_totals,
+)
+from sql_engine import shot_xg_profile, team_season_totals
+from wages import CURRENCY_SYMBOLS
 
 # setup logging
 logging.basicConfig(level=logging.INFO)
@@ -116,11 +141,9 @@ st.set_page_config(
 # st.write(os.sys.executable)
 
 
-@st.cache_data
+@st.cache_data(ttl=API_REFRESH_INTERVALS["teams"])
 def get_team_to_id_mapping():
-    url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookup_all_teams.php?id={EPL_ID}"
-    response = requests.get(url)
-    data = response.json()
+    data = fetch_json("lookup_all_teams.php", {"id": EPL_ID})
     team_to_id = {team["strTeam"]: team["idTeam"] for team in data["teams"]}
     print(f"team_to_id: {team_to_id}")
     return team_to_id
@@ -130,106 +153,150 @@ def get_id_from_team_name(team_to_id, team_name):
     return team_to_id.get(team_name, None)
 
 
-@st.cache_data
-def fetch_player_data(team_name, team_id):
-    print("Inside fetch_player_data()")
-    url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/searchplayers.php?t={team_name}"
-    response = requests.get(url)
-    data = response.json()
-    players = data.get("player", [])
+def team_badge(team_data):
+    # Tiny badge of the first team in a lookupteam.php response, if any
+    teams = (team_data or {}).get("teams")
+    if not teams:
+        return None
+    return teams[0]["strTeamBadge"] + "/tiny"
 
-    url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookup_all_players.php?id={team_id}"
-    response = requests.get(url)
-    data = response.json()
-    players = data.get("player", [])
 
-    for player in players:
-        print(f"Fetched player: {player['strPlayer']}")
-        honors_url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookuphonours.php?id={player['idPlayer']}"
-        honors_response = requests.get(honors_url)
-        honors_data = honors_response.json()
-        player["trophies"] = (
-            len(honors_data.get("honours", [])) if honors_data.get("honours") else 0
+def player_teams(player):
+    # (name, id) of the teams whose badge is shown for a player, in order of
+    # preference: their second team if they have one, then their own team
+    teams = [(player.get("strTeam2"), player["idTeam2"])] if player.get("idTeam2") else []
+    return teams + [(player.get("strTeam"), player["idTeam"])]
+
+
+@st.cache_data(ttl=API_REFRESH_INTERVALS["squads"])
+def fetch_player_data(team_name, team_id):
+    print("Inside fetch_player_data()")
+    (data,) = fetch_all([("lookup_all_players.php", {"id": team_id})])
+    players = (data or {}).get("player") or []
+
+    # League badges are already known from get_badges, so only other teams
+    # (mostly national sides) are looked up, once per distinct team
+    badges, _ = get_badges()
+    candidates = [player_teams(player) for player in players]
+    unknown = list(
+        dict.fromkeys(
+            team_id
+            for teams in candidates
+            for name, team_id in teams
+            if name not in badges
         )
+    )
+    results = fetch_all(
+        [("lookuphonours.php", {"id": player["idPlayer"]}) for player in players]
+        + [("lookupteam.php", {"id": team_id}) for team_id in unknown]
+    )
+    honours = results[: len(players)]
+    looked_up = dict(zip(unknown, map(team_badge, results[len(players) :])))
 
-        if player.get("idTeam2"):
-            team2_url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookupteam.php?id={player['idTeam2']}"
-            team2_response = requests.get(team2_url)
-            team2_data = team2_response.json()
-            if "teams" in team2_data and team2_data["teams"]:
-                team2_badge = team2_data["teams"][0]["strTeamBadge"] + "/tiny"
-                player["Int"] = team2_badge
-            else:
-                player["Int"] = (
-                    f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookupteam.php?id={player['idTeam']}"
-                )
-                team_response = requests.get(player["Int"])
-                team_data = team_response.json()
-                if "teams" in team_data and team_data["teams"]:
-                    player["Int"] = team_data["teams"][0]["strTeamBadge"] + "/tiny"
-                else:
-                    player["Int"] = "\u20DD"
-        else:
-            player["Int"] = (
-                f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookupteam.php?id={player['idTeam']}"
-            )
-            team_response = requests.get(player["Int"])
-            team_data = team_response.json()
-            if "teams" in team_data and team_data["teams"]:
-                player["Int"] = team_data["teams"][0]["strTeamBadge"] + "/tiny"
-            else:
-                player["Int"] = "\u20DD"
+    for player, honours_data, teams in zip(players, honours, candidates):
+        print(f"Fetched player: {player['strPlayer']}")
+        player["trophies"] = len((honours_data or {}).get("honours") or [])
+        found = (badges.get(name) or looked_up.get(team_id) for name, team_id in teams)
+        player["Int"] = next((badge for badge in found if badge), "\u20DD")
 
     return players
 
 
-@st.cache_data
+@st.cache_data(ttl=API_REFRESH_INTERVALS["teams"])
 def get_badges():
     league_ids = [EPL_ID, EFL_CHAMPIONSHIP_ID, EFL_LEAGUE_ONE_ID]
     badges = {}
     player_images = {}
 
-    with requests.Session() as session:
-        for league_id in league_ids:
-            url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookup_all_teams.php?id={league_id}"
-            response = session.get(url)
-            if response.status_code != 200:
-                print(f"Failed to fetch data for league ID: {league_id}")
-                continue
-            data = response.json()
-            league_badges = {
-                team["strTeam"]: team["strTeamBadge"] + "/tiny"
-                for team in data.get("teams", [])
-            }
-            badges.update(league_badges)
-
-            team_ids = [team["idTeam"] for team in data.get("teams", [])]
-
-            for team_id in team_ids:
-                url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookup_all_players.php?id={team_id}"
-                response = session.get(url)
-                if response.status_code != 200:
-                    print(f"Failed to fetch data for team ID: {team_id}")
-                    continue
-                data = response.json()
-                team_data = data.get("player", [])
-                player_images.update(
-                    {
-                        player["strPlayer"]: player["strRender"] + "/tiny"
-                        for player in team_data
-                        if player["strRender"]
-                    }
-                )
+    # Every league at once, then every team's squad at once. fetch_all keeps
+    # within the client's rate limit, so with an empty cache the squads go
+    # out at API_RATE_LIMIT a second after the first API_BURST (see config).
+    # Results come back in order, so later leagues still win for teams and
+    # players listed twice.
+    leagues = fetch_all(
+        [("lookup_all_teams.php", {"id": league_id}) for league_id in league_ids]
+    )
+    team_ids = []
+    for league_id, data in zip(league_ids, leagues):
+        if data is None:
+            print(f"Failed to fetch data for league ID: {league_id}")
+            continue
+        teams = data.get("teams") or []
+        badges.update(
+            {team["strTeam"]: team["strTeamBadge"] + "/tiny" for team in teams}
+        )
+        team_ids += [team["idTeam"] for team in teams]
 
-    player_images_df = pd.DataFrame(
-        player_images.items(), columns=["Player", "Player_Image"]
+    squads = fetch_all(
+        [("lookup_all_players.php", {"id": team_id}) for team_id in team_ids]
     )
-    player_images_df["Player"] = player_images_df["Player"].apply(unidecode)
-    player_images_dict = player_images_df.set_index("Player")["Player_Image"].to_dict()
+    for team_id, data in zip(team_ids, squads):
+        if data is None:
+            print(f"Failed to fetch data for team ID: {team_id}")
+            continue
+        player_images.update(
+            {
+                player["strPlayer"]: player["strRender"] + "/tiny"
+                for player in data.get("player") or []
+                if player["strRender"]
+            }
+        )
+
+    # Keyed by normalised name, for matching to player_id through the name index
+    player_images_dict = {
+        name_key(name): image for name, image in player_images.items()
+    }
 
     return badges, player_images_dict
 
 
+# Columns feature_engineering reads from each of its inputs
+FEATURE_PLAYER_COLUMNS = [
+    "player_id",
+    "player",
+    "team",
+    "position",
+    "minutes",
+    "goals",
+    "shots",
+    "xg",
+    "xa",
+    "xg_chain",
+    "xg_buildup",
+    "own_goals",
+]
+FEATURE_SUMMARY_COLUMNS = [
+    "player_id",
+    "team_id",
+    "position",
+    "assists",
+    "season",
+    "season_id",
+    "matches",
+    "np_goals",
+    "np_xg",
+    "key_passes",
+    "yellow_cards",
+    "red_cards",
+    "xT_total",
+    "xT_perAction",
+]
+FEATURE_SHOT_COLUMNS = [
+    "shot_id",
+    "player_id",
+    "player",
+    "result",
+    "situation",
+    "body_part",
+    "zone_y",
+    "opponent_name",
+    "is_home_team",
+    "season_id",
+    "assist_player",
+    "xg",
+]
+
+
 @st.cache_data
 def feature_engineering(
     df_players_matches, df_players_summary, df_shots, team_badges, player_images_dict
@@ -298,7 +365,7 @@ def feature_engineering(
     )
 
     df_players_matches["img"] = df_players_matches["team"].map(team_badges)
-    df_players_matches["player_image"] = df_players_matches["player"].map(
+    df_players_matches["player_image"] = df_players_matches["player_id"].map(
         player_images_dict
     )
 
@@ -328,6 +395,7 @@ def feature_engineering(
             "assist_player",
         ],
         as_index=False,
+        observed=True,
     ).agg({"shot_id": "count", "xg": "sum"})
     df_shots.rename(columns={"shot_id": "shots"}, inplace=True)
 
@@ -661,6 +729,21 @@ def add_badges(df, badges, playerwise=True):
 
     return styled_df_badges
 
+# Columns the Chance Creation tab reads from shots
+CHANCE_CREATION_COLUMNS = [
+    "player",
+    "assist_player",
+    "team",
+    "position",
+    "situation",
+    "body_part",
+    "zone_y",
+    "result",
+    "xg",
+    "game",
+]
+
+
 @st.cache_data
 def transform_shot_data_assist(df_shots):
     required_columns = [
@@ -680,151 +763,15 @@ def transform_shot_data_assist(df_shots):
         logging.error(f"Missing columns in DataFrame: {missing_columns}")
         return None, None
 
-    # Calculate the total xG, the count of shots, and the count of unique games for each group
-    grouped_data = (
-        df_shots.groupby(
-            ["assist_player", "team", "situation", "body_part", "zone_y", "result"]
-        )
-        .agg(
-            total_xg=pd.NamedAgg(column="xg", aggfunc="sum"),
-            shot_count=pd.NamedAgg(column="xg", aggfunc="count"),
-        )
-        .reset_index()
-    )
-
-    # Calculate matches per assist_player and team
-    matches_data = (
-        df_shots.groupby(["assist_player", "team"])
-        .agg(matches=pd.NamedAgg(column="game", aggfunc="nunique"))
-        .reset_index()
-    )
-
-    # Calculate the per shot xG
-    grouped_data["per_shot_xg"] = grouped_data["total_xg"] / grouped_data["shot_count"]
-
-    # Pivot the data for situations
-    situation_pivot = grouped_data.pivot_table(
-        index=["assist_player", "team"],
-        columns="situation",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    situation_pivot.columns = [f"{col} xG" for col in situation_pivot.columns]
-    situation_pivot.reset_index(inplace=True)
-
-    # Pivot the data for body parts
-    body_part_pivot = grouped_data.pivot_table(
-        index=["assist_player", "team"],
-        columns="body_part",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    body_part_pivot.columns = [f"{col} xG" for col in body_part_pivot.columns]
-    body_part_pivot.reset_index(inplace=True)
-
-    # Pivot the data for zone_y
-    zone_y_pivot = grouped_data.pivot_table(
-        index=["assist_player", "team"],
-        columns="zone_y",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    zone_y_pivot.columns = [f"{col} xG" for col in zone_y_pivot.columns]
-    zone_y_pivot.reset_index(inplace=True)
-
-    # Pivot the data for result
-    result_pivot = grouped_data.pivot_table(
-        index=["assist_player", "team"],
-        columns="result",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    result_pivot.columns = [f"{col} xG" for col in result_pivot.columns]
-    result_pivot.reset_index(inplace=True)
-
-    # Merge the pivot tables on assist_player and team
-    assistwise_result = situation_pivot.merge(
-        body_part_pivot, on=["assist_player", "team"], how="outer"
-    )
-    assistwise_result = assistwise_result.merge(
-        zone_y_pivot, on=["assist_player", "team"], how="outer"
-    )
-
-    # Merge the result_pivot with assistwise_result
-    assistwise_result = assistwise_result.merge(
-        result_pivot, on=["assist_player", "team"], how="outer"
-    )
-
-    # Add matches to the assistwise_result
-    assistwise_result = assistwise_result.merge(
-        matches_data, on=["assist_player", "team"], how="left"
-    )
-
-    # Calculate teamwise data
-    team_grouped_data = (
-        df_shots.groupby(["team", "situation", "body_part", "zone_y", "result"])
-        .agg(
-            total_xg=pd.NamedAgg(column="xg", aggfunc="sum"),
-            shot_count=pd.NamedAgg(column="xg", aggfunc="count"),
+    if use_duckdb():
+        # One query per table instead of the groupbys, pivots and merges of
+        # assist_shot_profiles
+        return (
+            shot_xg_profile(df_shots, ASSIST_SHOT_KEYS, with_matches=True),
+            shot_xg_profile(df_shots, ["team"]),
         )
-        .reset_index()
-    )
-
-    # Calculate the per shot xG
-    team_grouped_data["per_shot_xg"] = (
-        team_grouped_data["total_xg"] / team_grouped_data["shot_count"]
-    )
-
-    # Pivot the data for situations
-    team_situation_pivot = team_grouped_data.pivot_table(
-        index=["team"],
-        columns="situation",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    team_situation_pivot.columns = [f"{col} xG" for col in team_situation_pivot.columns]
-    team_situation_pivot.reset_index(inplace=True)
-
-    # Pivot the data for body parts
-    team_body_part_pivot = team_grouped_data.pivot_table(
-        index=["team"],
-        columns="body_part",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    team_body_part_pivot.columns = [f"{col} xG" for col in team_body_part_pivot.columns]
-    team_body_part_pivot.reset_index(inplace=True)
-
-    # Pivot the data for zone_y
-    team_zone_y_pivot = team_grouped_data.pivot_table(
-        index=["team"],
-        columns="zone_y",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    team_zone_y_pivot.columns = [f"{col} xG" for col in team_zone_y_pivot.columns]
-    team_zone_y_pivot.reset_index(inplace=True)
-
-    # Pivot the data for result
-    team_result_pivot = team_grouped_data.pivot_table(
-        index=["team"],
-        columns="result",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    team_result_pivot.columns = [f"{col} xG" for col in team_result_pivot.columns]
-    team_result_pivot.reset_index(inplace=True)
-
-    # Merge the pivot tables on team
-    teamwise_result = team_situation_pivot.merge(
-        team_body_part_pivot, on="team", how="outer"
-    )
-    teamwise_result = teamwise_result.merge(team_zone_y_pivot, on="team", how="outer")
-
-    # Merge the result_pivot with teamwise_result
-    teamwise_result = teamwise_result.merge(team_result_pivot, on="team", how="outer")
 
-    return assistwise_result, teamwise_result
+    return assist_shot_profiles(df_shots)
 
 
 def transform_shots_data(df_shots):
@@ -848,6 +795,7 @@ def transform_shots_data(df_shots):
             # "assist_player",
         ],
         as_index=False,
+        observed=True,
     ).agg({"shot_id": "count", "xg": "sum"})
     df_shots.rename(columns={"shot_id": "shots"}, inplace=True)
 
@@ -856,151 +804,31 @@ def transform_shots_data(df_shots):
 
 @st.cache_data
 def transform_shot_data(df_shots):
-    # Calculate the total xG, the count of shots, and the count of unique games for each group
-    grouped_data = (
-        df_shots.groupby(
-            ["player", "team", "position", "situation", "body_part", "zone_y", "result"]
-        )
-        .agg(
-            total_xg=pd.NamedAgg(column="xg", aggfunc="sum"),
-            shot_count=pd.NamedAgg(column="xg", aggfunc="count"),
-        )
-        .reset_index()
-    )
-
-    # Calculate matches per player, team, and position
-    matches_data = (
-        df_shots.groupby(["player", "team", "position"])
-        .agg(matches=pd.NamedAgg(column="game", aggfunc="nunique"))
-        .reset_index()
-    )
-
-    # Calculate the per shot xG
-    grouped_data["per_shot_xg"] = grouped_data["total_xg"] / grouped_data["shot_count"]
-
-    # Pivot the data for situations
-    situation_pivot = grouped_data.pivot_table(
-        index=["player", "team", "position"],
-        columns="situation",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    situation_pivot.columns = [f"{col} xG" for col in situation_pivot.columns]
-    situation_pivot.reset_index(inplace=True)
-
-    # Pivot the data for body parts
-    body_part_pivot = grouped_data.pivot_table(
-        index=["player", "team", "position"],
-        columns="body_part",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    body_part_pivot.columns = [f"{col} xG" for col in body_part_pivot.columns]
-    body_part_pivot.reset_index(inplace=True)
-
-    # Pivot the data for zone_y
-    zone_y_pivot = grouped_data.pivot_table(
-        index=["player", "team", "position"],
-        columns="zone_y",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    zone_y_pivot.columns = [f"{col} xG" for col in zone_y_pivot.columns]
-    zone_y_pivot.reset_index(inplace=True)
-
-    # Pivot the data for result
-    result_pivot = grouped_data.pivot_table(
-        index=["player", "team", "position"],
-        columns="result",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    result_pivot.columns = [f"{col} xG" for col in result_pivot.columns]
-    result_pivot.reset_index(inplace=True)
-
-    # Merge the pivot tables on player, team, and position
-    playerwise_result = situation_pivot.merge(
-        body_part_pivot, on=["player", "team", "position"], how="outer"
-    )
-    playerwise_result = playerwise_result.merge(
-        zone_y_pivot, on=["player", "team", "position"], how="outer"
-    )
-
-    # Merge the result_pivot with playerwise_result
-    playerwise_result = playerwise_result.merge(
-        result_pivot, on=["player", "team", "position"], how="outer"
-    )
-
-    # Add matches to the playerwise_result
-    playerwise_result = playerwise_result.merge(
-        matches_data, on=["player", "team", "position"], how="left"
-    )
-
-    # Calculate teamwise data
-    team_grouped_data = (
-        df_shots.groupby(["team", "situation", "body_part", "zone_y", "result"])
-        .agg(
-            total_xg=pd.NamedAgg(column="xg", aggfunc="sum"),
-            shot_count=pd.NamedAgg(column="xg", aggfunc="count"),
+    if use_duckdb():
+        # One query per table instead of the groupbys, pivots and merges of
+        # player_shot_profiles
+        return (
+            shot_xg_profile(df_shots, PLAYER_SHOT_KEYS, with_matches=True),
+            shot_xg_profile(df_shots, ["team"]),
         )
-        .reset_index()
-    )
 
-    # Calculate the per shot xG
-    team_grouped_data["per_shot_xg"] = (
-        team_grouped_data["total_xg"] / team_grouped_data["shot_count"]
-    )
-
-    # Pivot the data for situations
-    team_situation_pivot = team_grouped_data.pivot_table(
-        index=["team"],
-        columns="situation",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    team_situation_pivot.columns = [f"{col} xG" for col in team_situation_pivot.columns]
-    team_situation_pivot.reset_index(inplace=True)
-
-    # Pivot the data for body parts
-    team_body_part_pivot = team_grouped_data.pivot_table(
-        index=["team"],
-        columns="body_part",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    team_body_part_pivot.columns = [f"{col} xG" for col in team_body_part_pivot.columns]
-    team_body_part_pivot.reset_index(inplace=True)
-
-    # Pivot the data for zone_y
-    team_zone_y_pivot = team_grouped_data.pivot_table(
-        index=["team"],
-        columns="zone_y",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    team_zone_y_pivot.columns = [f"{col} xG" for col in team_zone_y_pivot.columns]
-    team_zone_y_pivot.reset_index(inplace=True)
-
-    # Pivot the data for result
-    team_result_pivot = team_grouped_data.pivot_table(
-        index=["team"],
-        columns="result",
-        values="per_shot_xg",
-        fill_value=0,
-    )
-    team_result_pivot.columns = [f"{col} xG" for col in team_result_pivot.columns]
-    team_result_pivot.reset_index(inplace=True)
+    return player_shot_profiles(df_shots)
 
-    # Merge the pivot tables on team
-    teamwise_result = team_situation_pivot.merge(
-        team_body_part_pivot, on="team", how="outer"
-    )
-    teamwise_result = teamwise_result.merge(team_zone_y_pivot, on="team", how="outer")
 
-    # Merge the result_pivot with teamwise_result
-    teamwise_result = teamwise_result.merge(team_result_pivot, on="team", how="outer")
+# Columns plot_home_away_goals reads from team_stats, the calendar columns
+# and total_goals are added to the snapshot at ingest
+SCORING_TREND_COLUMNS = [
+    "season_id",
+    "date",
+    "day_of_week",
+    "month",
+    "home_goals",
+    "away_goals",
+    "total_goals",
+]
 
-    return playerwise_result, teamwise_result
+# Months shown on the Scoring Trends heatmap
+SCORING_TREND_MONTHS = SEASON_MONTHS[:10]
 
 
 @st.cache_data
@@ -1024,10 +852,11 @@ def plot_home_away_goals(df):
     total_matches = df.shape[0]
 
     # Calculate the number of matches for each combination of home and away goals
-    df['matches'] = df.groupby(['home_goals', 'away_goals'])['home_goals'].transform('count')
+    # The frame is cached by the caller, so new columns go on a copy
+    matches = df.groupby(['home_goals', 'away_goals'])['home_goals'].transform('count')
 
     # Calculate the percentage of total for each bin
-    df['percentage'] = df['matches'] / total_matches * 100
+    df = df.assign(matches=matches, percentage=matches / total_matches * 100)
 
     chart = alt.Chart(df).mark_rect().encode(
         alt.X('xFeaturePos:Q', title='Home Goals', axis=alt.Axis(values=list(range(int(df['home_goals'].max()+1))), grid=False, tickOpacity=0, domainOpacity=0)),
@@ -1053,30 +882,22 @@ def plot_home_away_goals(df):
         height=400
     )
 
-    # Convert the 'date' column to datetime
-    df['date'] = pd.to_datetime(df['date'])
-
-    # Create a new column for the day of the week
-    df['day_of_week'] = df['date'].dt.day_name()
-
-    # Create a month column
-    df['month'] = df['date'].dt.month_name()
-
-    # Create a new column for the total goals scored
-    df['total_goals'] = df['home_goals'] + df['away_goals']
-
-    # Put the data in order of the month from August to May and seasons so that the most recent season is at the top of the bar
-    df['month'] = pd.Categorical(df['month'], categories=['August', 'September', 'October', 'November', 'December', 'January', 'February', 'March', 'April', 'May'], ordered=True)
-    df['season_id'] = pd.Categorical(df['season_id'], categories=df['season_id'].unique(), ordered=True)
+    # day_of_week, month and total_goals are computed once at ingest (see
+    # data_store.add_calendar_columns). Keep the months from August to May and
+    # order seasons so that the most recent season is at the top of the bar
+    df = df.assign(
+        month=df['month'].cat.set_categories(SCORING_TREND_MONTHS, ordered=True),
+        season_id=pd.Categorical(df['season_id'], categories=df['season_id'].unique(), ordered=True),
+    )
 
     # Calculate the total number of matches for each combination of 'month', 'day_of_week' and 'season_id'
-    df['total_matches'] = df.groupby(['month', 'day_of_week', 'season_id'])['total_goals'].transform('size')
+    df['total_matches'] = df.groupby(['month', 'day_of_week', 'season_id'], observed=True)['total_goals'].transform('size')
 
     # Calculate the number of unique seasons for each combination of 'month' and 'day_of_week'
-    df['unique_seasons'] = df.groupby(['month', 'day_of_week'])['season_id'].transform('nunique')
+    df['unique_seasons'] = df.groupby(['month', 'day_of_week'], observed=True)['season_id'].transform('nunique')
 
     # Calculate the average total goals per match for each combination of 'month', 'day_of_week' and 'season_id'
-    avg_goals_month_day_season = df.groupby(['month', 'day_of_week', 'season_id']).agg({'total_goals': 'mean', 'total_matches': 'first', 'unique_seasons': 'first'}).reset_index().round(2)
+    avg_goals_month_day_season = df.groupby(['month', 'day_of_week', 'season_id'], observed=True).agg({'total_goals': 'mean', 'total_matches': 'first', 'unique_seasons': 'first'}).reset_index().round(2)
     avg_goals_month_day_season.columns = ['month', 'day_of_week', 'season_id', 'avg_total_goals', 'total_matches', 'unique_seasons']
 
     # Update the tooltip in chart2 to include total matches
@@ -1138,6 +959,12 @@ def render_player_table(players, player_wages):
         "Height",
     ]
 
+    # Serve the cutouts and badges from local copies at their display size
+    df_players_matches["Player"] = localise(
+        df_players_matches["Player"].tolist(), PLAYER_SIZE
+    )
+    df_players_matches["Int"] = localise(df_players_matches["Int"].tolist(), BADGE_SIZE)
+
     print(f"\n\nUnique players in df_players_matches: {df_players_matches['Name'].unique()}")
     # print(f"\n\nUnique players in player_wages: {player_wages['name'].unique()}")
 
@@ -1149,15 +976,16 @@ def render_player_table(players, player_wages):
         lambda x: pd.Timestamp.now().year - x.year
     )
 
-    # Apply unidecode to the player names for consistent merging
-    df_players_matches["Name"] = df_players_matches["Name"].apply(unidecode)
+    # Transliterate the names once per distinct name, and merge on the
+    # normalised key the wages table already carries
+    df_players_matches["Name"] = transliterate_names(df_players_matches["Name"])
 
     # Merge player data with player wages
     df_players_wages = pd.merge(
         df_players_matches,
         player_wages,
-        left_on="Name",
-        right_on="name",
+        left_on=name_keys(df_players_matches["Name"]),
+        right_on="name_key",
         how="left",
     )
 
@@ -1177,9 +1005,9 @@ def render_player_table(players, player_wages):
             "Int",
             "Nation",
             "Number",
-            "weekly_gross_gbp",
+            "weekly_gross",
             "years",
-            "release_gbp",
+            "release",
         ]
     ]
     df_players_wages.columns = [
@@ -1201,14 +1029,16 @@ def render_player_table(players, player_wages):
         drop=True
     )
 
+    # Wages are stored in minor units (pence, cents)
+    df_players_wages[["WklyWages", "Release"]] = (
+        df_players_wages[["WklyWages", "Release"]] / 100
+    )
+
     # Sort df_players_wages by Wages
     df_players_wages = df_players_wages.sort_values(
         "WklyWages", ascending=False
     ).reset_index(drop=True)
 
-    # Fill nan values with NA
-    df_players_wages.fillna("NA", inplace=True)
-
     # If there is Manager in position, move it to the top
     if "Manager" in df_players_matches["Position"].values:
         manager = df_players_matches[df_players_matches["Position"] == "Manager"]
@@ -1223,17 +1053,6 @@ def render_player_table(players, player_wages):
             drop=True
         )
 
-    # Format the wage columns to include currency symbol and commas
-    df_players_wages["WklyWages"] = df_players_wages["WklyWages"].apply(
-        lambda x: f"£{x:,.2f}" if x != "NA" else "NA"
-    )
-    df_players_wages["Release"] = df_players_wages["Release"].apply(
-        lambda x: f"£{x:,.2f}" if x != "NA" else "NA"
-    )
-    df_players_wages["YrsLeft"] = df_players_wages["YrsLeft"].apply(
-        lambda x: f"{x}" if x != "NA" else "NA"
-    )
-
     df_players_matches["Player"] = df_players_matches.apply(
         lambda row: f'<img src="{row["Player"]}" width="50">', axis=1
     )
@@ -1316,8 +1135,16 @@ def render_player_table(players, player_wages):
         )
     )
 
+    # Wages stay numeric, the currency symbol and commas are only added when
+    # the table is rendered
+    symbol = CURRENCY_SYMBOLS[WAGES_CURRENCY]
     styled_df_players_wages = (
-        df_players_wages.style.set_properties(
+        df_players_wages.style.format(na_rep="NA")
+        .format(
+            {"WklyWages": f"{symbol}{{:,.2f}}", "Release": f"{symbol}{{:,.2f}}"},
+            na_rep="NA",
+        )
+        .set_properties(
             subset=["Name", "Position", "Nation"],
             **{
                 "text-align": "left",
@@ -1384,11 +1211,9 @@ def render_player_table(players, player_wages):
 
 
 # Fetch data from the API
-@st.cache_data
+@st.cache_data(ttl=API_REFRESH_INTERVALS["standings"])
 def get_data():
-    url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookuptable.php?l={EPL_ID}&s={SEASON}"
-    response = requests.get(url)
-    data = response.json()
+    data = fetch_json("lookuptable.php", {"l": EPL_ID, "s": SEASON})
     return data["table"]
 
 
@@ -1396,128 +1221,30 @@ def get_data():
 # Get badges from API
 
 
-# @st.cache_data
-# def load_player_data(filter=None):
-#     try:
-#         # Determine the base path
-#         base_path = os.path.dirname(
-#             os.path.abspath(__file__)
-#         )  # Get the current script directory
-#         data_path = os.path.join(base_path, "../data")  # Local data path
-
-#         if not os.path.exists(
-#             data_path
-#         ):  # If not in local environment, use production path
-#             data_path = "/mnt/src/2425_project/data"
-
-#         # Construct the file paths using the data path
-#         df1 = pd.read_csv(os.path.join(data_path, "combined_data.csv"))
-#         df_players_matches = pd.read_csv(
-#             os.path.join(data_path, "players_matches_data.csv")
-#         )
-#         df_players_summary = pd.read_csv(
-#             os.path.join(data_path, "players_summary_data.csv")
-#         )
-#         df_shots = pd.read_csv(os.path.join(data_path, "shot_events.csv"))
-#         df_team_stats = pd.read_csv(os.path.join(data_path, "team_stats.csv"))
-#         df_player_wages = pd.read_csv(
-#             os.path.join(data_path, "premier_league_salaries.csv")
-#         )
-#         df_xT = pd.read_csv(os.path.join(data_path, "players_xT_data.csv"))
-
-#         # Print df_team_stats columns for debugging
-#         print(f"Columns_in_df_team_stats:\n\n{df_team_stats.columns}")
-
-#         # Groupby team df_players_summary by team and season
-#         df_summary_teams = df_players_summary.groupby(
-#             ["team", "season_id"], as_index=False
-#         ).sum()
-
-#         # If filter is True, filter the df_player_wages data for the 2023 season
-#         if filter:
-#             df_player_wages = df_player_wages[df_player_wages["season"] == 2023]
-#             df_summary_teams = df_summary_teams[df_summary_teams["season_id"] == 2023]
-
-
-#         return (
-#             df1,
-#             df_players_matches,
-#             df_players_summary,
-#             df_summary_teams,
-#             df_shots,
-#             df_team_stats,
-#             df_player_wages,
-#             df_xT
-#         )
-#     except FileNotFoundError as e:
-#         print(f"FileNotFoundError caught: {e}")
-#         logging.exception("Exception occurred")
-#         return None, None, None, None, None, None, None, None
-
-
-@st.cache_data
-def load_player_data(filter=None):
-    try:
-        # Determine the base path
-        current_path = os.path.dirname(os.path.abspath(__file__))
-        if os.path.exists(os.path.join(current_path, "../data")):
-            base_path = os.path.join(current_path, "../data")  # Local environment
-        else:
-            base_path = "/mnt/src/2425_project/data"  # Deployed environment
-
-        # Construct the file paths using the base path
-        df1 = pd.read_csv(os.path.join(base_path, "combined_data.csv"))
-        df_players_matches = pd.read_csv(
-            os.path.join(base_path, "players_matches_data.csv")
-        )
-        df_players_summary = pd.read_csv(
-            os.path.join(base_path, "players_summary_data.csv")
-        )
-        df_shots = pd.read_csv(os.path.join(base_path, "shot_events.csv"))
-        df_team_stats = pd.read_csv(os.path.join(base_path, "team_stats.csv"))
-        df_player_wages = pd.read_csv(
-            os.path.join(base_path, "premier_league_salaries.csv")
-        )
-        df_xT = pd.read_csv(os.path.join(base_path, "players_xT_data.csv"))
-
-        # Groupby team df_players_summary by team and season
-        df_summary_teams = df_players_summary.groupby(
-            ["team", "season_id"], as_index=False
-        ).sum()
-
-        def get_most_common_position(positions):
-            filtered_positions = positions[positions != "Sub"]
-            if filtered_positions.empty:
-                return "Sub"
-            return filtered_positions.value_counts().index[0]
-
-        # Create a dictionary that maps player_id to the most common position
-        player_positions = df_players_matches.groupby("player_id")["position"].agg(get_most_common_position)
-
-        # Add position to the df_shots DataFrame
-        df_shots = df_shots.merge(
-            player_positions, left_on="player_id", right_index=True, how="left"
-        )
-
-        # If filter is True, filter the df_player_wages data for the 2023 season
-        if filter:
-            df_player_wages = df_player_wages[df_player_wages["season"] == 2023]
-            df_summary_teams = df_summary_teams[df_summary_teams["season_id"] == 2023]
-
-        return (
-            df1,
-            df_players_matches,
-            df_players_summary,
-            df_summary_teams,
-            df_shots,
-            df_team_stats,
-            df_player_wages,
-            df_xT,
-            player_positions
-        )
-    except FileNotFoundError as e:
-        logging.exception("Exception occurred")
-        return None, None, None, None, None, None, None, None, None
+# Columns process_team_stats reads from team_stats and the summed
+# players_summary columns it reads from the team summary
+TEAM_STATS_COLUMNS = [
+    "season_id",
+    "home_team",
+    "away_team",
+    "home_points",
+    "away_points",
+    "home_expected_points",
+    "away_expected_points",
+    "home_goals",
+    "away_goals",
+    "home_xg",
+    "away_xg",
+    "home_np_xg",
+    "away_np_xg",
+    "home_np_xg_difference",
+    "away_np_xg_difference",
+    "home_ppda",
+    "away_ppda",
+    "home_deep_completions",
+    "away_deep_completions",
+]
+TEAM_SUMMARY_COLUMNS = ["np_goals", "assists", "xa"]
 
 
 # @st.cache_data
@@ -1536,110 +1263,14 @@ def process_team_stats(df, df_team_summary, season_range, team_badges):
         & (df_team_summary["season_id"] <= season_range[1])
     ]
 
-    # Home DataFrame
-    home_df = df[
-        [
-            "match_id",
-            "season",
-            "game",
-            "league_id",
-            "season_id",
-            "game_id",
-            "date",
-            "home_team",
-            "home_points",
-            "home_expected_points",
-            "home_goals",
-            "home_xg",
-            "home_np_xg",
-            "home_np_xg_difference",
-            "away_goals",
-            "home_ppda",
-            "away_ppda",
-            "home_deep_completions",
-            "away_deep_completions",
-        ]
-    ].rename(
-        columns={
-            "home_team": "team",
-            "home_points": "points",
-            "home_expected_points": "xPoints",
-            "home_goals": "goals",
-            "away_goals": "GA",
-            "home_xg": "xG",
-            "home_np_xg": "npxG",
-            "home_np_xg_difference": "npxGD",
-            "home_ppda": "ppda",
-            "away_ppda": "ppda_against",
-            "home_deep_completions": "deep_completions",
-            "away_deep_completions": "deep_completions_allowed",
-        }
-    )
-
-    # Away DataFrame
-    away_df = df[
-        [
-            "match_id",
-            "season",
-            "game",
-            "league_id",
-            "season_id",
-            "game_id",
-            "date",
-            "away_team",
-            "away_points",
-            "away_expected_points",
-            "away_goals",
-            "away_xg",
-            "away_np_xg",
-            "away_np_xg_difference",
-            "home_goals",
-            "away_ppda",
-            "home_ppda",
-            "away_deep_completions",
-            "home_deep_completions",
-        ]
-    ].rename(
-        columns={
-            "away_team": "team",
-            "away_points": "points",
-            "away_expected_points": "xPoints",
-            "away_goals": "goals",
-            "home_goals": "GA",
-            "away_xg": "xG",
-            "away_np_xg": "npxG",
-            "away_np_xg_difference": "npxGD",
-            "away_ppda": "ppda",
-            "home_ppda": "ppda_against",
-            "away_deep_completions": "deep_completions",
-            "home_deep_completions": "deep_completions_allowed",
-        }
-    )
-
-    # Concatenate DataFrames
-    team_df = pd.concat([home_df, away_df], ignore_index=True)
-
     pd.set_option("display.float_format", lambda x: "%.1f" % x)
 
-    team_df["img"] = team_df["team"].map(team_badges)
-
-    # Aggregate team_df by team and season
-    agg_funcs = {
-        "img": "first",  # Get the first badge
-        "points": "sum",
-        "xPoints": "sum",
-        "goals": "sum",
-        "GA": "sum",
-        "xG": "sum",
-        "npxG": "sum",
-        "npxGD": "sum",
-        "ppda": "mean",
-        "ppda_against": "mean",
-        "deep_completions": "sum",
-        "deep_completions_allowed": "sum",
-    }
-
-    team_aggregated = team_df.groupby(["team", "season_id"]).agg(agg_funcs).reset_index()
+    if use_duckdb():
+        # Stack and aggregate the home and away rows in DuckDB
+        team_aggregated = team_season_totals(season_range)
+    else:
+        team_aggregated = team_match_totals(df)
+    team_aggregated.insert(2, "img", team_aggregated["team"].map(team_badges))
 
     # Merge team_aggregated with df_team_summary on team and season
     merged_df = pd.merge(
@@ -1953,8 +1584,96 @@ def highlight_categorical(val, color_mapping):
 #     template_file,
 # )
 
+# Season the season sliders start on
+DEFAULT_SEASON = 2023
+
+
+def latest_player_season():
+    # What tab3's season selectbox starts on
+    return distinct_values("players_matches", "season_id", reverse=True)[0]
+
+
+@st.cache_resource
+def prefetch_tab_data():
+    """
+    Read what every tab shows with its widgets at their defaults, concurrently,
+    once per server process. st.tabs runs every tab body on each rerun, so on
+    a cold start the tabs then find their datasets and projections already
+    cached instead of reading them one after another.
+    """
+    season_range = (DEFAULT_SEASON, DEFAULT_SEASON)
+    try:
+        run_loaders(
+            [
+                load_player_name_index,
+                # tab2
+                lambda: load_team_summary(columns=TEAM_SUMMARY_COLUMNS),
+                lambda: load_team_stats_range(season_range, TEAM_STATS_COLUMNS),
+                # tab3
+                lambda: load_xT(FEATURE_SUMMARY_COLUMNS),
+                lambda: distinct_values("players_matches", "team"),
+                lambda: distinct_values(
+                    "players_matches",
+                    "position",
+                    season_id=latest_player_season(),
+                    team="All",
+                ),
+                lambda: select_dataset(
+                    "players_matches",
+                    columns=FEATURE_PLAYER_COLUMNS,
+                    season_id=latest_player_season(),
+                    team="All",
+                    position="All",
+                ),
+                lambda: select_dataset(
+                    "shots",
+                    columns=FEATURE_SHOT_COLUMNS,
+                    season_id=latest_player_season(),
+                    team="All",
+                ),
+                # tab4
+                lambda: distinct_values("shots", "team", season_id=season_range),
+                lambda: distinct_values(
+                    "shots", "position", season_id=season_range, team="All"
+                ),
+                lambda: select_dataset(
+                    "shots",
+                    columns=CHANCE_CREATION_COLUMNS,
+                    season_id=season_range,
+                    team="All",
+                    position="All",
+                ),
+                # tab5
+                lambda: load_player_wages(filter=True),
+                # tab6
+                lambda: load_team_stats_range(season_range, SCORING_TREND_COLUMNS),
+            ]
+        )
+    except Exception:
+        # A missing dataset is reported by the tab that reads it; the others
+        # still load on their own
+        logging.exception("Prefetching the tab data failed")
+
+
 def main():
+    # Re-ingest data files that change while the app is running, and keep
+    # the TheSportsDB responses warm so pages do not wait on the API
+    start_watcher()
+    start_warmer()
+
+    if not database_healthy():
+        st.error(
+            "The database cannot be reached, so the Player Stats and Chance "
+            "Creation tabs may not load."
+        )
+
+    prefetch_tab_data()
+
     team_badges, player_images = get_badges()
+    # Outside get_badges' cache, so badges switch to their local copies as
+    # soon as the background downloads finish
+    team_badges = localise_map(team_badges, BADGE_SIZE)
+    player_images = key_by_id(player_images, load_player_name_index())
     team_to_id_dict = get_team_to_id_mapping()
 
     data = get_data()
@@ -2003,6 +1722,7 @@ def main():
             unsafe_allow_html=True,
         )
 
+        df["img"] = localise(df["img"].tolist(), BADGE_SIZE)
         df["img"] = df.apply(
             lambda row: f'<img src="{row["img"]}" width="32">', axis=1
         )
@@ -2092,18 +1812,20 @@ def main():
 
     with tab2:
         st.header("Team Stats")
-        _, _, _, df_team_summary, _, df_team_stats, _, _, _ = load_player_data()
+        df_team_summary = load_team_summary(columns=TEAM_SUMMARY_COLUMNS)
 
-        season_ids = df_team_stats['season_id'].unique()
-        default_season = 2023
+        season_ids = available_seasons("team_stats")
+        default_season = DEFAULT_SEASON
         season_range = st.slider(
             "Select Season Range",
-            min_value=int(season_ids.min()),
-            max_value=int(season_ids.max()),
+            min_value=int(min(season_ids)),
+            max_value=int(max(season_ids)),
             value=(default_season, default_season),
             key="team_season_range",
         )
 
+        df_team_stats = load_team_stats_range(season_range, TEAM_STATS_COLUMNS)
+
         styled_team_stats = process_team_stats(
             df_team_stats, df_team_summary, season_range, team_badges
         )
@@ -2115,51 +1837,41 @@ def main():
 
     with tab3:
         st.header("Player Stats")
-        (
-            df1,
-            df_players,
-            df_players_summary,
-            df_summary_teams,
-            df_shots,
-            df_team_stats,
-            df_players_wages,
-            df_xT,
-            _
-        ) = load_player_data()
-
-        all_season_ids = ["All"] + sorted(df_players["season_id"].unique(), reverse=True)
+        df_xT = load_xT(FEATURE_SUMMARY_COLUMNS)
+
         season_id = st.selectbox(
             "Select a season to filter the data",
-            sorted(df_players["season_id"].unique(), reverse=True),
+            distinct_values("players_matches", "season_id", reverse=True),
             placeholder="2023",
         )
 
-        teams = ["All"] + sorted(df_players["team"].unique())
+        teams = ["All"] + distinct_values("players_matches", "team")
         team = st.selectbox(
             "Select a team to filter the data",
             teams,
             placeholder="All",
         )
 
-        if team != "All":
-            df_players = df_players[df_players["team"] == team]
-            df_players_summary = df_players_summary[df_players_summary["team"] == team]
-            df_shots = df_shots[df_shots["team"] == team]
-
-        if season_id != "All":
-            df_players = df_players[df_players["season_id"] == season_id]
-            df_players_summary = df_players_summary[df_players_summary["season_id"] == season_id]
-            df_shots = df_shots[df_shots["season_id"] == season_id]
-
-        positions = ["All"] + sorted(df_players["position"].unique().tolist())
+        positions = ["All"] + distinct_values(
+            "players_matches", "position", season_id=season_id, team=team
+        )
         position = st.selectbox(
             "Select a position to filter the data",
             positions,
             placeholder="All",
         )
 
-        if position != "All":
-            df_players = df_players[df_players["position"] == position]
+        # With the postgres backend only the selected rows are fetched
+        df_players = select_dataset(
+            "players_matches",
+            columns=FEATURE_PLAYER_COLUMNS,
+            season_id=season_id,
+            team=team,
+            position=position,
+        )
+        df_shots = select_dataset(
+            "shots", columns=FEATURE_SHOT_COLUMNS, season_id=season_id, team=team
+        )
 
         df_players_matches, df_players_summary_merge, _ = feature_engineering(
             df_players, df_xT, df_shots, team_badges, player_images
@@ -2168,11 +1880,18 @@ def main():
         df_players_matches["img"] = df_players_matches.apply(
             lambda row: f'<img src="{row["img"]}" width="32">', axis=1
         )
+        # Player images are shown at badge size here
+        df_players_matches["player_image"] = localise(
+            df_players_matches["player_image"].tolist(), BADGE_SIZE
+        )
         df_players_matches["player_image"] = df_players_matches["player_image"].apply(lambda x: f'<img src="{x}" width="32">')
 
         df_players_summary_merge["img"] = df_players_summary_merge.apply(
             lambda row: f'<img src="{row["img"]}" width="32">', axis=1
         )
+        df_players_summary_merge["player_image"] = localise(
+            df_players_summary_merge["player_image"].tolist(), BADGE_SIZE
+        )
         df_players_summary_merge["player_image"] = df_players_summary_merge["player_image"].apply(lambda x: f'<img src="{x}" width="32">')
 
         df_players_matches = df_players_matches[
@@ -2442,13 +2161,8 @@ def main():
     with tab4:
         st.header("Chance Creation")
 
-        _, _, _, _, df_shots, _, _, _, player_positions = load_player_data()
-
-        # Log shots data columns
-        st.write(df_shots.columns)
-
-        season_ids = sorted(df_shots["season_id"].unique(), reverse=True)
-        default_season = 2023
+        season_ids = distinct_values("shots", "season_id", reverse=True)
+        default_season = DEFAULT_SEASON
         season_range = st.slider(
             "Select Season Range",
             min_value=int(min(season_ids)),
@@ -2457,12 +2171,7 @@ def main():
             key="chance_creation_season_range",
         )
 
-        df_shots = df_shots[
-            (df_shots["season_id"] >= season_range[0])
-            & (df_shots["season_id"] <= season_range[1])
-        ]
-
-        teams = ["All"] + sorted(df_shots["team"].unique())
+        teams = ["All"] + distinct_values("shots", "team", season_id=season_range)
         default_team = "All"
 
         team = st.selectbox(
@@ -2472,10 +2181,9 @@ def main():
             key="chance_creation_team",
         )
 
-        if team != "All":
-            df_shots = df_shots[df_shots["team"] == team]
-
-        positions = ["All"] + sorted(df_shots["position"].unique())
+        positions = ["All"] + distinct_values(
+            "shots", "position", season_id=season_range, team=team
+        )
         default_position = "All"
 
         position = st.selectbox(
@@ -2485,8 +2193,16 @@ def main():
             key="chance_creation_position",
         )
 
-        if position != "All":
-            df_shots = df_shots[df_shots["position"] == position]
+        df_shots = select_dataset(
+            "shots",
+            columns=CHANCE_CREATION_COLUMNS,
+            season_id=season_range,
+            team=team,
+            position=position,
+        )
+
+        # Log shots data columns
+        st.write(df_shots.columns)
 
         df_shots_copy = df_shots.copy()
 
@@ -2562,7 +2278,7 @@ def main():
     with tab5:
         st.header("Team Players")
 
-        _, _, _, _, _, _, df_players_wages, _, _ = load_player_data(filter=True)
+        df_players_wages = load_player_wages(filter=True)
 
         team = st.selectbox(
             "Select a team", sorted(df["Team"].unique()), placeholder="Arsenal"
@@ -2597,22 +2313,17 @@ def main():
     with tab6:
         st.header("Scoring Trends")
 
-        _, _, _, _, _, df_team_stats, _, _, _ = load_player_data()
-
-        season_ids = df_team_stats['season_id'].unique()
-        default_season = 2023
+        season_ids = available_seasons("team_stats")
+        default_season = DEFAULT_SEASON
         season_range = st.slider(
             "Select Season Range",
-            min_value=int(season_ids.min()),
-            max_value=int(season_ids.max()),
+            min_value=int(min(season_ids)),
+            max_value=int(max(season_ids)),
             value=(default_season, default_season),
             key="scoring_trends_season_range",
         )
 
-        df_team_stats = df_team_stats[
-            (df_team_stats["season_id"] >= season_range[0])
-            & (df_team_stats["season_id"] <= season_range[1])
-        ]
+        df_team_stats = load_team_stats_range(season_range, SCORING_TREND_COLUMNS)
 
         alt_chart, alt_chart2 = plot_home_away_goals(df_team_stats)
 
@@ -1,13 +1,13 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import requests
 import numpy as np
 import altair as alt
 import logging
 import os
 
-from config import API_KEY, EPL_ID, EFL_CHAMPIONSHIP_ID, EFL_LEAGUE_ONE_ID, SEASON, fm_rubik, FenomenSans
+from config import EPL_ID, EFL_CHAMPIONSHIP_ID, EFL_LEAGUE_ONE_ID, SEASON, fm_rubik, FenomenSans
+from sportsdb_client import fetch_json
 
 # setup logging
 logging.basicConfig(level=logging.INFO)
@@ -50,17 +50,13 @@ def highlight_categorical(val, color_mapping):
 # Caching API calls to minimize repeated requests
 @st.cache_data
 def get_team_to_id_mapping():
-    url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookup_all_teams.php?id={EPL_ID}"
-    response = requests.get(url)
-    data = response.json()
+    data = fetch_json("lookup_all_teams.php", {"id": EPL_ID})
     team_to_id = {team["strTeam"]: team["idTeam"] for team in data["teams"]}
     return team_to_id
 
 @st.cache_data
 def fetch_player_data(team_name, team_id):
-    url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookup_all_players.php?id={team_id}"
-    response = requests.get(url)
-    data = response.json()
+    data = fetch_json("lookup_all_players.php", {"id": team_id})
     players = data.get("player", [])
     return players
 
@@ -69,16 +65,13 @@ def get_badges():
     league_ids = [EPL_ID, EFL_CHAMPIONSHIP_ID, EFL_LEAGUE_ONE_ID]
     badges = {}
 
-    with requests.Session() as session:
-        for league_id in league_ids:
-            url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookup_all_teams.php?id={league_id}"
-            response = session.get(url)
-            data = response.json()
-            league_badges = {
-                team["strTeam"]: team["strTeamBadge"] + "/tiny"
-                for team in data.get("teams", [])
-            }
-            badges.update(league_badges)
+    for league_id in league_ids:
+        data = fetch_json("lookup_all_teams.php", {"id": league_id})
+        league_badges = {
+            team["strTeam"]: team["strTeamBadge"] + "/tiny"
+            for team in data.get("teams", [])
+        }
+        badges.update(league_badges)
 
     return badges
 
@@ -318,9 +311,7 @@ def render_player_table(players, player_wages):
 
 @st.cache_data
 def get_data():
-    url = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}/lookuptable.php?l={EPL_ID}&s={SEASON}"
-    response = requests.get(url)
-    data = response.json()
+    data = fetch_json("lookuptable.php", {"l": EPL_ID, "s": SEASON})
     return data["table"]
 
 
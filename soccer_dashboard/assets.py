@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from config import ASSET_CONCURRENCY, ASSET_RETRIES, ASSET_TIMEOUT
+
+# Downloaded images live in Streamlit's static folder, which is served at
+# app/static/ (enableStaticServing in .streamlit/config.toml)
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "assets")
+ASSET_URL = "app/static/assets"
+
+# Widths the images are displayed at, and stored at
+BADGE_SIZE = 32
+PLAYER_SIZE = 50
+
+# Images that could not be fetched, not tried again until the app restarts
+_failed = set()
+
+# Downloads run in the background so a render never waits on them; images
+# queued or in progress are kept in _pending so each is only fetched once
+_executor = ThreadPoolExecutor(ASSET_CONCURRENCY, thread_name_prefix="assets")
+_pending = set()
+_pending_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # Keep-alive connections to the image hosts, separate from the API's
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=ASSET_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+            )
+            adapter = HTTPAdapter(
+                pool_connections=4, pool_maxsize=ASSET_CONCURRENCY, max_retries=retry
+            )
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+    return _session
+
+
+def asset_name(url, size):
+    return f"{hashlib.sha1(url.encode()).hexdigest()[:16]}_{size}.png"
+
+
+def asset_path(url, size):
+    return os.path.join(ASSET_DIR, asset_name(url, size))
+
+
+def is_remote(url):
+    return isinstance(url, str) and url.startswith(("http://", "https://"))
+
+
+def asset_url(url, size):
+    # The local copy when there is one, otherwise the url unchanged
+    if is_remote(url) and os.path.exists(asset_path(url, size)):
+        return f"{ASSET_URL}/{asset_name(url, size)}"
+    return url
+
+
+def download(url, size, timeout=ASSET_TIMEOUT):
+    try:
+        fetch_image(url, size, timeout)
+    finally:
+        with _pending_lock:
+            _pending.discard((url, size))
+
+
+def fetch_image(url, size, timeout=ASSET_TIMEOUT):
+    try:
+        response = get_session().get(url, timeout=timeout)
+        response.raise_for_status()
+        image = Image.open(BytesIO(response.content)).convert("RGBA")
+    except (requests.RequestException, OSError) as e:
+        logging.warning(f"Could not fetch image {url}: {e}")
+        _failed.add((url, size))
+        return
+
+    # Scale to the display width, keeping the aspect ratio
+    height = max(1, round(size * image.height / image.width))
+    image = image.resize((size, height), Image.LANCZOS)
+
+    path = asset_path(url, size)
+    tmp_path = f"{path}.tmp"
+    image.save(tmp_path, format="PNG", optimize=True)
+    os.replace(tmp_path, path)
+
+
+def localise(urls, size):
+    """
+    Local URLs for a list of remote images. Images not stored yet keep their
+    remote URL, so the browser loads them for now, and are downloaded and
+    resized in the background for later renders. Anything that is not a URL
+    is returned as it is.
+    """
+    missing = [
+        url
+        for url in dict.fromkeys(urls)
+        if is_remote(url)
+        and (url, size) not in _failed
+        and not os.path.exists(asset_path(url, size))
+    ]
+    with _pending_lock:
+        queued = [url for url in missing if (url, size) not in _pending]
+        _pending.update((url, size) for url in queued)
+    if queued:
+        os.makedirs(ASSET_DIR, exist_ok=True)
+        for url in queued:
+            _executor.submit(download, url, size)
+        logging.info(f"Queued {len(queued)} images at {size}px")
+    return [asset_url(url, size) for url in urls]
+
+
+def localise_map(mapping, size):
+    return dict(zip(mapping, localise(list(mapping.values()), size)))
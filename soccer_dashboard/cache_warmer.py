@@ -0,0 +1,161 @@
+import argparse
+import logging
+import threading
+import time
+
+import streamlit as st
+
+from config import (
+    API_REFRESH_INTERVALS,
+    API_WARMER,
+    EFL_CHAMPIONSHIP_ID,
+    EFL_LEAGUE_ONE_ID,
+    EPL_ID,
+    SEASON,
+)
+import api_cache
+from sportsdb_client import fetch_all, fetch_json
+
+# Leagues whose teams and squads get_badges crawls
+LEAGUE_IDS = [EPL_ID, EFL_CHAMPIONSHIP_ID, EFL_LEAGUE_ONE_ID]
+
+
+def league_team_ids(league_ids, refresh=False, max_age=None):
+    leagues = fetch_all(
+        [("lookup_all_teams.php", {"id": league_id}) for league_id in league_ids],
+        refresh=refresh,
+        max_age=max_age,
+    )
+    return [
+        team["idTeam"] for data in leagues if data for team in data.get("teams") or []
+    ]
+
+
+# Each job revalidates the responses it covers that are older than max_age,
+# and reads the rest from the cache
+
+
+def warm_standings(max_age):
+    # What get_data shows
+    fetch_json(
+        "lookuptable.php", {"l": EPL_ID, "s": SEASON}, refresh=True, max_age=max_age
+    )
+
+
+def warm_teams(max_age):
+    # Every league and squad list get_badges and get_team_to_id_mapping read
+    team_ids = league_team_ids(LEAGUE_IDS, refresh=True, max_age=max_age)
+    fetch_all(
+        [("lookup_all_players.php", {"id": team_id}) for team_id in team_ids],
+        refresh=True,
+        max_age=max_age,
+    )
+
+
+def warm_squads(max_age):
+    # The honours and team lookups fetch_player_data makes for every
+    # Premier League squad (the squad lists come from warm_teams)
+    squads = fetch_all(
+        [
+            ("lookup_all_players.php", {"id": team_id})
+            for team_id in league_team_ids([EPL_ID])
+        ]
+    )
+    players = [
+        player for data in squads if data for player in data.get("player") or []
+    ]
+    team_ids = dict.fromkeys(
+        player[key]
+        for player in players
+        for key in ("idTeam", "idTeam2")
+        if player.get(key)
+    )
+    fetch_all(
+        [("lookuphonours.php", {"id": player["idPlayer"]}) for player in players]
+        + [("lookupteam.php", {"id": team_id}) for team_id in team_ids],
+        refresh=True,
+        max_age=max_age,
+    )
+
+
+# Warmed in this order, each on its own interval from API_REFRESH_INTERVALS
+JOBS = {
+    "standings": warm_standings,
+    "teams": warm_teams,
+    "squads": warm_squads,
+}
+
+
+def warm(names=None, intervals=API_REFRESH_INTERVALS):
+    for name in JOBS if names is None else names:
+        start = time.perf_counter()
+        try:
+            # Responses fetched in the last half interval (by a page, or late
+            # in the previous run) are recent enough to be left alone
+            JOBS[name](intervals[name] / 2)
+        except Exception:
+            logging.exception(f"Warming {name} failed")
+            continue
+        api_cache.record_warmed(name)
+        logging.info(f"Warmed {name} in {time.perf_counter() - start:.1f}s")
+
+
+def run_scheduler(intervals=API_REFRESH_INTERVALS):
+    """
+    Run each job whenever its interval has passed since it last finished,
+    in this or an earlier process, so a restart with a warm cache makes no
+    requests. Refreshed responses replace the cached ones in a single
+    write, so readers see either the old or the new copy. Runs until the
+    process exits.
+    """
+    # Last finish times are wall clock, the schedule below is monotonic
+    offset = time.monotonic() - time.time()
+    next_run = {
+        name: api_cache.last_warmed(name) + intervals[name] + offset for name in JOBS
+    }
+    while True:
+        now = time.monotonic()
+        due = [name for name in JOBS if next_run[name] <= now]
+        warm(due, intervals)
+        for name in due:
+            next_run[name] = time.monotonic() + intervals[name]
+        time.sleep(max(1, min(next_run.values()) - time.monotonic()))
+
+
+@st.cache_resource
+def start_warmer():
+    # One warmer thread per server process, shared by every session
+    if API_WARMER != "thread":
+        return None
+    thread = threading.Thread(target=run_scheduler, name="cache-warmer", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description="Keep the TheSportsDB response cache warm"
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="warm everything once and exit, e.g. as a deploy step",
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        choices=list(JOBS),
+        help="with --once, only warm this group (can be repeated)",
+    )
+    args = parser.parse_args()
+
+    if args.once:
+        warm(args.only)
+        return
+    run_scheduler()
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,37 @@ DB_PARAMS = {
     "port": "5432",
 }
 
+# Process-wide connection pool shared by every Streamlit session
+DB_POOL_SIZE = 5
+DB_POOL_MAX_OVERFLOW = 5
+DB_POOL_TIMEOUT = 30  # seconds to wait for a free connection
+DB_POOL_RECYCLE = 1800  # seconds before a connection is replaced
+DB_STATEMENT_TIMEOUT_MS = 15000
+# Seconds between database health checks, each of which logs the pool metrics
+DB_HEALTH_INTERVAL = 60
+
+# Where the Player Stats and Chance Creation tabs read from: "files" loads the
+# snapshots/CSVs, "postgres" pushes the filters down to the database tables
+DATA_BACKEND = "files"
+
+# What runs the heavy aggregations: "pandas" or "duckdb", which queries the
+# snapshots in place (falls back to pandas when duckdb is not installed).
+# Check the two agree with `python -m pytest tests` (synthetic data) or
+# `python sql_engine.py` (the real snapshots).
+SQL_ENGINE = "pandas"
+
+# Currency the unified wages table is converted to (see wages.py), using the
+# rates in data/fx_rates.csv
+WAGES_CURRENCY = "GBP"
+
+# Datasets loaded at once on a thread pool when the app first starts; 1 loads
+# them one after another
+LOAD_WORKERS = 4
+
+# Seconds between checks of the data files for changes. Changed files are
+# re-ingested in the background and only their loaders re-read; 0 disables
+WATCH_INTERVAL = 30
+
 # Warnings
 warnings.filterwarnings("ignore")
 
@@ -64,8 +95,71 @@ local_fontpath_2 = "/Users/hogan/Library/CloudStorage/Dropbox/Mac/Documents/GitH
 FenomenSans = FontProperties(fname=local_fontpath_2)
 
 # API Configuration
+# Point API_BASE_URL at "http://localhost:8765/api/v1/json" to use the local
+# stand-in started by `python sportsdb_stub.py serve`
+API_BASE_URL = "https://www.thesportsdb.com/api/v1/json"
 API_KEY = "60130162"
 EPL_ID = "4328"
 EFL_CHAMPIONSHIP_ID = "4329"
 EFL_LEAGUE_ONE_ID = "4396"
 SEASON = "2023-2024"
+
+# Lookups made at once when fetching a squad, and seconds before a single
+# request is given up on
+API_CONCURRENCY = 8
+API_TIMEOUT = 10
+
+# Requests per second sent to TheSportsDB by the whole process, and how many
+# may go out at once after a quiet spell. Keep within the API key's plan.
+# These bound a cold badge crawl: its ~75 requests (3 leagues and every
+# squad) take at least (75 - API_BURST) / API_RATE_LIMIT seconds, about 13s
+# here. After that the responses come from the cache, kept current by the
+# warmer, so only the first load with an empty cache waits on it.
+API_RATE_LIMIT = 5
+API_BURST = 10
+
+# Retries of a throttled (429), server error or timed out request, with
+# exponential backoff and jitter from API_BACKOFF up to API_BACKOFF_MAX seconds
+API_RETRIES = 3
+API_BACKOFF = 0.5
+API_BACKOFF_MAX = 8
+
+# Failed requests in a row that make further calls fail fast, and the seconds
+# before a single request is let through to test the API again
+API_BREAKER_FAILURES = 5
+API_BREAKER_COOLDOWN = 30
+
+# How TheSportsDB data is kept warm: "thread" refreshes it from a background
+# thread of the app, "worker" leaves that to `python cache_warmer.py` running
+# next to it, and "off" fetches on demand. With a warmer, pages are served
+# the cached copy while it is refreshed and only wait on the API for data
+# that was never fetched.
+API_WARMER = "thread"
+# With a warmer, cached responses are still revalidated once their age reaches
+# this many times their TTL, in case the warmer has stopped
+API_STALE_FACTOR = 3
+# Seconds between refreshes of each group of API data
+API_REFRESH_INTERVALS = {
+    "standings": 10 * 60,
+    "teams": 24 * 3600,
+    "squads": 24 * 3600,
+}
+
+# Seconds a TheSportsDB response is reused from the on-disk cache, per
+# endpoint, before it is revalidated. Endpoints not listed are not cached.
+API_CACHE_TTL = {
+    "lookup_all_teams.php": 7 * 24 * 3600,
+    "lookupteam.php": 7 * 24 * 3600,
+    "lookup_all_players.php": 24 * 3600,
+    "lookuphonours.php": 24 * 3600,
+    "lookuptable.php": 15 * 60,
+}
+# The cache is trimmed to this size, least recently used responses first
+API_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# Badge and player images come from TheSportsDB's CDN, not the API, so they
+# have their own connections, timeout and retries and do not count towards
+# the API rate limit or circuit breaker
+ASSET_CONCURRENCY = 8
+ASSET_TIMEOUT = 5
+ASSET_RETRIES = 2
@@ -0,0 +1,389 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from aggregations import team_season_summary
+from config import (
+    DATA_BACKEND,
+    DB_HEALTH_INTERVAL,
+    LOAD_WORKERS,
+    SQL_ENGINE,
+    WAGES_CURRENCY,
+    WATCH_INTERVAL,
+)
+from data_store import (
+    DATASETS,
+    PARTITIONED_DATASETS,
+    available_seasons,
+    canonical_name,
+    compact_dtypes,
+    dataset_fingerprint,
+    read_dataset,
+    read_season,
+    refresh_changed,
+    watch,
+)
+from db_pool import check_health, pool_metrics
+from db_queries import select_distinct, select_rows
+from names import build_name_index, name_keys
+import sql_engine
+from wages import build_wages, read_wages, wages_are_fresh, wages_fingerprint
+
+# One loader per dataset, so a tab only parses and holds the files it
+# actually uses. Nothing is read until a loader is first called.
+
+
+def use_duckdb():
+    return SQL_ENGINE == "duckdb" and sql_engine.is_available()
+
+
+# Loaders take an optional list of columns. Callers pass the columns they
+# use and only those are parsed and cached; None reads every column.
+#
+# The cached functions also take the fingerprint (size and mtime) of the
+# files they read. It is only part of the cache key: when the watcher below
+# re-ingests a changed file its fingerprint changes and that dataset is read
+# again, while every other dataset stays cached.
+#
+# Old versions are never asked for again, so each cache is capped at the
+# entries its current versions need and the least recently used go first.
+
+# Column lists a dataset is loaded with across the tabs, plus headroom
+PROJECTIONS_PER_DATASET = 8
+# Seasons a partitioned dataset holds
+MAX_SEASONS = 12
+
+DATASET_CACHE_ENTRIES = len(DATASETS) * PROJECTIONS_PER_DATASET
+SEASON_CACHE_ENTRIES = MAX_SEASONS * PROJECTIONS_PER_DATASET
+# Derived tables have one current version; two leaves room for the next
+DERIVED_CACHE_ENTRIES = 2
+
+
+def refresh_data(base_path=None):
+    # Re-ingest changed datasets and rebuild a stale wages table
+    refreshed = refresh_changed(base_path)
+    if not wages_are_fresh(WAGES_CURRENCY, base_path):
+        build_wages(WAGES_CURRENCY, base_path)
+        refreshed.append("wages")
+    return refreshed
+
+
+@st.cache_resource
+def start_watcher(interval=WATCH_INTERVAL):
+    # One watcher thread per server process, shared by every session
+    if interval <= 0 or DATA_BACKEND == "postgres":
+        return None
+    thread = threading.Thread(
+        target=watch,
+        args=(interval,),
+        kwargs={"refresh": refresh_data},
+        name="data-watcher",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+@st.cache_resource(ttl=DB_HEALTH_INTERVAL)
+def database_healthy():
+    """
+    Whether the postgres backend answers, checked at most once per
+    DB_HEALTH_INTERVAL per process rather than on every rerun. Logs the
+    pool metrics with each check. Always True with the files backend.
+    """
+    if DATA_BACKEND != "postgres":
+        return True
+    healthy = check_health()
+    logging.info(
+        f"Database {'healthy' if healthy else 'unreachable'}, pool: {pool_metrics()}"
+    )
+    return healthy
+
+
+@st.cache_data(max_entries=DATASET_CACHE_ENTRIES)
+def load_source(name, fingerprint, columns=None):
+    # Cached per canonical dataset, so files that ingest found to have the
+    # same content share one parsed copy
+    return read_dataset(name, columns=columns)
+
+
+def load_dataset(name, columns=None):
+    name = canonical_name(name)
+    return load_source(name, dataset_fingerprint(name), columns)
+
+
+def load_combined_data(columns=None):
+    return load_dataset("combined_data", columns)
+
+
+def load_players_matches(columns=None):
+    return load_dataset("players_matches", columns)
+
+
+def load_players_summary(columns=None):
+    return load_dataset("players_summary", columns)
+
+
+def load_team_stats(columns=None):
+    return load_dataset("team_stats", columns)
+
+
+@st.cache_data(max_entries=SEASON_CACHE_ENTRIES)
+def load_team_stats_partition(season_id, fingerprint, columns=None):
+    # Each season is keyed on its own partition, so an incremental ingest
+    # only re-reads the seasons it rewrote
+    return read_season("team_stats", season_id, columns=columns)
+
+
+def seasons_in_range(name, season_range):
+    return [
+        season_id
+        for season_id in available_seasons(name)
+        if season_range[0] <= season_id <= season_range[1]
+    ]
+
+
+def load_team_stats_season(season_id, columns=None):
+    return load_team_stats_partition(
+        season_id, dataset_fingerprint("team_stats", season_id=season_id), columns
+    )
+
+
+def load_team_stats_range(season_range, columns=None):
+    frames = [
+        load_team_stats_season(season_id, columns)
+        for season_id in seasons_in_range("team_stats", season_range)
+    ]
+    if not frames:
+        return load_team_stats_season(season_range[0], columns)
+    # Each season carries its own categories, so compact again after joining
+    return compact_dtypes(pd.concat(frames, ignore_index=True))
+
+
+def load_xT(columns=None):
+    return load_dataset("xT", columns)
+
+
+@st.cache_data(max_entries=DERIVED_CACHE_ENTRIES)
+def load_wages_table(currency, fingerprint):
+    # name_key is worked out once per wages version, for joins on player names
+    df = read_wages(currency)
+    return df.assign(name_key=name_keys(df["name"]))
+
+
+def load_wages(currency=WAGES_CURRENCY):
+    # Every league's wages, in minor units of one currency
+    return load_wages_table(currency, wages_fingerprint(currency))
+
+
+def load_player_wages(filter=None, league="premier-league"):
+    # A cheap mask over the cached wages table, so not cached itself
+    df_player_wages = load_wages()
+    df_player_wages = df_player_wages[df_player_wages["league"] == league]
+
+    # If filter is True, filter the df_player_wages data for the 2023 season
+    if filter:
+        df_player_wages = df_player_wages[df_player_wages["season"] == 2023]
+
+    return df_player_wages
+
+
+def load_team_summary(filter=None, columns=None):
+    return team_summary(dataset_fingerprint("players_summary"), filter, columns)
+
+
+@st.cache_data(max_entries=PROJECTIONS_PER_DATASET)
+def team_summary(fingerprint, filter=None, columns=None):
+    # columns are the summed columns wanted, team and season_id always come
+    if use_duckdb():
+        # Aggregate straight off the snapshot without loading players_summary
+        df_summary_teams = sql_engine.team_summary(columns=columns)
+    else:
+        keys = ["team", "season_id"]
+        df_players_summary = load_players_summary(
+            None if columns is None else keys + list(columns)
+        )
+
+        df_summary_teams = team_season_summary(df_players_summary)
+
+    if filter:
+        df_summary_teams = df_summary_teams[df_summary_teams["season_id"] == 2023]
+
+    return df_summary_teams
+
+
+def get_most_common_position(positions):
+    filtered_positions = positions[positions != "Sub"]
+    if filtered_positions.empty:
+        return "Sub"
+    return filtered_positions.value_counts().index[0]
+
+
+def load_player_positions():
+    return player_positions(dataset_fingerprint("players_matches"))
+
+
+@st.cache_data(max_entries=DERIVED_CACHE_ENTRIES)
+def player_positions(fingerprint):
+    df_players_matches = load_players_matches(["player_id", "position"])
+
+    # Map player_id to the most common position
+    return df_players_matches.groupby("player_id")["position"].agg(
+        get_most_common_position
+    )
+
+
+def load_player_name_index():
+    return player_name_index(dataset_fingerprint("players_matches"))
+
+
+@st.cache_data(max_entries=DERIVED_CACHE_ENTRIES)
+def player_name_index(fingerprint):
+    # Name key -> player_id, rebuilt only when players_matches changes
+    df_players_matches = load_players_matches(["player", "player_id"])
+    return build_name_index(
+        df_players_matches["player"], df_players_matches["player_id"]
+    )
+
+
+def shot_file_columns(columns):
+    # position is not in the shots file, it is looked up by player_id
+    if columns is None:
+        return None
+    return [col for col in dict.fromkeys([*columns, "player_id"]) if col != "position"]
+
+
+def add_positions(df_shots, columns=None):
+    # Add position to the df_shots DataFrame
+    if columns is None or "position" in columns:
+        df_shots = df_shots.merge(
+            load_player_positions(), left_on="player_id", right_index=True, how="left"
+        )
+    return df_shots if columns is None else df_shots[list(columns)]
+
+
+def shots_fingerprint(season_id=None):
+    # Positions come from players_matches, so its changes count as well
+    return (
+        dataset_fingerprint("shots", season_id=season_id),
+        dataset_fingerprint("players_matches"),
+    )
+
+
+def load_shots(columns=None):
+    return load_shots_file(shots_fingerprint(), columns)
+
+
+@st.cache_data(max_entries=PROJECTIONS_PER_DATASET)
+def load_shots_file(fingerprint, columns=None):
+    return add_positions(
+        read_dataset("shots", columns=shot_file_columns(columns)), columns
+    )
+
+
+def load_shots_season(season_id, columns=None):
+    return load_shots_partition(season_id, shots_fingerprint(season_id), columns)
+
+
+@st.cache_data(max_entries=SEASON_CACHE_ENTRIES)
+def load_shots_partition(season_id, fingerprint, columns=None):
+    return add_positions(
+        read_season("shots", season_id, columns=shot_file_columns(columns)), columns
+    )
+
+
+def load_shots_range(season_range, columns=None):
+    frames = [
+        load_shots_season(season_id, columns)
+        for season_id in seasons_in_range("shots", season_range)
+    ]
+    if not frames:
+        return load_shots_season(season_range[0], columns)
+    return compact_dtypes(pd.concat(frames, ignore_index=True))
+
+
+def filter_frame(df, filters):
+    # Same filter semantics as db_queries.build_where
+    for column, value in filters.items():
+        if value is None or value == "All":
+            continue
+        if isinstance(value, tuple):
+            df = df[df[column].between(*value)]
+        elif isinstance(value, list):
+            df = df[df[column].isin(value)]
+        else:
+            df = df[df[column] == value]
+    return df
+
+
+def run_loaders(loaders, max_workers=LOAD_WORKERS):
+    """
+    Call zero-argument loaders concurrently on a thread pool and return
+    their results in order. With max_workers=1 they run one after another.
+    """
+    if max_workers <= 1:
+        return [loader() for loader in loaders]
+
+    # Worker threads need the session's script context for st.cache_data
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=max_workers, initializer=lambda: add_script_run_ctx(ctx=ctx)
+    ) as executor:
+        futures = [executor.submit(loader) for loader in loaders]
+        return [future.result() for future in futures]
+
+
+FILE_LOADERS = {
+    "players_matches": load_players_matches,
+    "shots": load_shots,
+}
+
+# Loaders that only read the seasons a season_id filter asks for
+SEASON_LOADERS = {
+    "shots": load_shots_range,
+}
+
+
+def load_filtered(name, filters, columns=None):
+    # The filtered columns are read too, and dropped again after filtering
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys([*columns, *filters]))
+
+    season_id = filters.get("season_id")
+    if name in SEASON_LOADERS and pd.api.types.is_integer(season_id):
+        season_id = (season_id, season_id)
+    if name in SEASON_LOADERS and isinstance(season_id, tuple):
+        df = SEASON_LOADERS[name](season_id, read_columns)
+    else:
+        df = FILE_LOADERS[name](read_columns)
+
+    df = filter_frame(df, filters)
+    return df if columns is None else df[list(columns)]
+
+
+def select_dataset(name, columns=None, **filters):
+    """
+    Return the rows of players_matches or shots that match the filters,
+    either from the database or by masking the loaded frame. With columns
+    given, only those columns are read.
+    """
+    if DATA_BACKEND == "postgres":
+        return select_rows(name, filters, columns)
+    return load_filtered(name, filters, columns)
+
+
+def distinct_values(name, column, reverse=False, **filters):
+    if DATA_BACKEND == "postgres":
+        values = select_distinct(name, column, filters)
+    elif column == "season_id" and name in PARTITIONED_DATASETS and not filters:
+        # The partition names already list the seasons
+        values = available_seasons(name)
+    else:
+        df = load_filtered(name, filters, [column])
+        values = df[column].dropna().unique().tolist()
+    return sorted(values, reverse=reverse)
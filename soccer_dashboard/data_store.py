@@ -0,0 +1,938 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Source CSV for each dataset the dashboard reads
+DATASETS = {
+    "combined_data": "combined_data.csv",
+    "players_matches": "players_matches_data.csv",
+    "players_summary": "players_summary_data.csv",
+    "shots": "shot_events.csv",
+    "team_stats": "team_stats.csv",
+    "player_wages": "premier_league_salaries.csv",
+    "player_wages_interim": "premier-league_salaries_interim.csv",
+    "xT": "players_xT_data.csv",
+}
+
+# Typed snapshots are written to this folder inside the data directory
+SNAPSHOT_DIR = "snapshots"
+
+# Datasets that support incremental ingestion, with the key rows are upserted on
+INCREMENTAL_KEYS = {
+    "combined_data": "match_id",
+    "team_stats": "match_id",
+}
+
+# Datasets written as one Parquet file per season, so a season range only
+# opens the files inside it
+PARTITIONED_DATASETS = ["team_stats", "shots"]
+
+# High-water marks and per-season versions are kept next to the snapshots
+INGEST_STATE_FILE = "ingest_state.json"
+
+# Bytes read at a time when hashing a source file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Floats are rounded to this many decimals before the parsed content is
+# hashed, so files that only differ in how floats were printed match
+CONTENT_HASH_DECIMALS = 9
+
+# pandas CSV parser: "c", or "pyarrow" which parses with several threads
+# and releases the GIL (parses booleans and date units slightly differently)
+CSV_ENGINE = "c"
+
+# Low-cardinality string columns that are stored as categoricals
+CATEGORICAL_COLUMNS = [
+    "team",
+    "player",
+    "position",
+    "situation",
+    "body_part",
+    "zone_y",
+    "result",
+    "season",
+]
+
+# Columns the match level datasets get at ingest, so the Scoring Trends tab
+# does no date parsing, and the source columns each is computed from
+CALENDAR_DATASETS = ["combined_data", "team_stats"]
+DERIVED_COLUMNS = {
+    "day_of_week": ["date"],
+    "month": ["date"],
+    "total_goals": ["home_goals", "away_goals"],
+}
+WEEKDAYS = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+# Months in season order, starting in August
+SEASON_MONTHS = [
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+]
+
+# Match level files (combined_data, team_stats) share the same layout
+MATCH_SCHEMA = {
+    "dtypes": {
+        "season": "int64",
+        "league_id": "int64",
+        "season_id": "int64",
+        "game_id": "int64",
+        "home_team_id": "int64",
+        "away_team_id": "int64",
+        "home_points": "int64",
+        "away_points": "int64",
+        "home_goals": "int64",
+        "away_goals": "int64",
+        "home_deep_completions": "int64",
+        "away_deep_completions": "int64",
+        "home_expected_points": "float64",
+        "away_expected_points": "float64",
+        "home_xg": "float64",
+        "away_xg": "float64",
+        "home_np_xg": "float64",
+        "away_np_xg": "float64",
+        "home_np_xg_difference": "float64",
+        "away_np_xg_difference": "float64",
+        "home_ppda": "float64",
+        "away_ppda": "float64",
+    },
+    "dates": ["date"],
+}
+
+# Salary files (premier_league_salaries and its interim copy)
+WAGES_SCHEMA = {
+    "dtypes": {
+        "weekly_gross_gbp": "int64",
+        "annual_gross_gbp": "int64",
+        "bonus_gross_gbp": "float64",
+        "years": "Int64",
+        "total_gross_gbp": "float64",
+        "release_gbp": "float64",
+        "age": "int64",
+        "season": "int64",
+        "adjusted_gross_gbp": "float64",
+    },
+    "dates": [],
+}
+
+# Fixed schema per dataset. String columns are left to the reader, ids and
+# counts that can be missing use the nullable Int64 type.
+SCHEMAS = {
+    "combined_data": MATCH_SCHEMA,
+    "team_stats": MATCH_SCHEMA,
+    "players_matches": {
+        "dtypes": {
+            "player_id": "Int64",
+            "team_id": "Int64",
+            "season_id": "Int64",
+            "minutes": "Int64",
+            "goals": "Int64",
+            "own_goals": "Int64",
+            "shots": "Int64",
+            "xg": "float64",
+            "xa": "float64",
+            "xg_chain": "float64",
+            "xg_buildup": "float64",
+        },
+        "dates": [],
+    },
+    "players_summary": {
+        "dtypes": {
+            "season": "int64",
+            "league_id": "int64",
+            "season_id": "int64",
+            "team_id": "int64",
+            "player_id": "int64",
+            "matches": "int64",
+            "minutes": "int64",
+            "goals": "int64",
+            "np_goals": "int64",
+            "assists": "int64",
+            "shots": "int64",
+            "key_passes": "int64",
+            "yellow_cards": "int64",
+            "red_cards": "int64",
+            "xg": "float64",
+            "np_xg": "float64",
+            "xa": "float64",
+            "xg_chain": "float64",
+            "xg_buildup": "float64",
+        },
+        "dates": [],
+    },
+    "shots": {
+        "dtypes": {
+            "shot_id": "Int64",
+            "player_id": "Int64",
+            "season_id": "Int64",
+            "xg": "float64",
+        },
+        "dates": [],
+    },
+    "player_wages": WAGES_SCHEMA,
+    "player_wages_interim": WAGES_SCHEMA,
+    "xT": {
+        "dtypes": {
+            "xT_total": "float64",
+            "actions": "int64",
+            "apps": "int64",
+            "xT_perAction": "float64",
+            "minutes": "Int64",
+            "goals": "Int64",
+            "xg": "float64",
+            "np_goals": "Int64",
+            "np_xg": "float64",
+            "assists": "Int64",
+            "xa": "float64",
+            "shots": "Int64",
+            "key_passes": "Int64",
+            "yellow_cards": "Int64",
+            "red_cards": "Int64",
+            "xg_chain": "float64",
+            "xg_buildup": "float64",
+            "league_id": "Int64",
+            "season": "int64",
+            "season_id": "Int64",
+            "team_id": "Int64",
+            "player_id": "Int64",
+            "matches": "Int64",
+        },
+        "dates": [],
+    },
+}
+
+
+def get_data_path():
+    current_path = os.path.dirname(os.path.abspath(__file__))
+    if os.path.exists(os.path.join(current_path, "../data")):
+        return os.path.join(current_path, "../data")  # Local environment
+    return "/mnt/src/2425_project/data"  # Deployed environment
+
+
+def csv_path(name, base_path=None):
+    return os.path.join(base_path or get_data_path(), DATASETS[name])
+
+
+def snapshot_path(name, base_path=None):
+    # Partitioned datasets are a directory of season files instead
+    if name in PARTITIONED_DATASETS:
+        return os.path.join(base_path or get_data_path(), SNAPSHOT_DIR, name)
+    return os.path.join(base_path or get_data_path(), SNAPSHOT_DIR, f"{name}.parquet")
+
+
+def partition_path(name, season_id, base_path=None):
+    filename = f"season_id={season_id}.parquet"
+    return os.path.join(snapshot_path(name, base_path), filename)
+
+
+def partition_seasons(name, base_path=None):
+    """
+    Seasons with a partition on disk, read from the file names alone.
+    """
+    directory = snapshot_path(name, base_path)
+    if not os.path.isdir(directory):
+        return []
+    seasons = []
+    for filename in os.listdir(directory):
+        if filename.startswith("season_id=") and filename.endswith(".parquet"):
+            seasons.append(int(filename[len("season_id=") : -len(".parquet")]))
+    return sorted(seasons)
+
+
+def partition_files(name, season_range=None, base_path=None):
+    # Partition pruning: only the files inside the range are returned
+    seasons = partition_seasons(name, base_path)
+    if season_range is not None:
+        seasons = [s for s in seasons if season_range[0] <= s <= season_range[1]]
+    return [partition_path(name, season, base_path) for season in seasons]
+
+
+def write_parquet(df, path):
+    # Write to a temporary file first so readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def write_partitions(name, df, base_path=None, seasons=None):
+    """
+    Write one Parquet file per season. With seasons given, only those
+    partitions are rewritten and the rest are left as they are.
+    """
+    directory = snapshot_path(name, base_path)
+    os.makedirs(directory, exist_ok=True)
+
+    if seasons is None:
+        seasons = sorted(int(season) for season in df["season_id"].dropna().unique())
+        # A full write replaces every partition, including dropped seasons
+        for season in partition_seasons(name, base_path):
+            if season not in seasons:
+                os.remove(partition_path(name, season, base_path))
+
+    for season in seasons:
+        path = partition_path(name, season, base_path)
+        write_parquet(df[df["season_id"] == season], path)
+
+    # The directory mtime is what freshness is checked against
+    os.utime(directory)
+
+
+def read_partitions(name, season_range=None, base_path=None, columns=None):
+    files = partition_files(name, season_range, base_path)
+    if not files:
+        # Keep the columns even when no season falls inside the range
+        files = partition_files(name, base_path=base_path)[:1]
+        if not files:
+            return pd.DataFrame(columns=columns)
+        return pd.read_parquet(files[0], columns=columns).iloc[0:0]
+
+    # Each file carries its own categories, so compact again after joining
+    frames = [pd.read_parquet(path, columns=columns) for path in files]
+    return compact_dtypes(pd.concat(frames, ignore_index=True))
+
+
+def read_csv_typed(name, base_path=None, columns=None):
+    """
+    Parse the source CSV of a dataset using its fixed schema, then compact
+    its dtypes. With columns given, only those columns are parsed.
+    """
+    schema = SCHEMAS[name]
+    path = csv_path(name, base_path)
+
+    # Derived columns are not in the file, read what they are computed from
+    read_columns = columns
+    if columns is not None and name in CALENDAR_DATASETS:
+        read_columns = list(
+            dict.fromkeys(
+                source
+                for col in columns
+                for source in DERIVED_COLUMNS.get(col, [col])
+            )
+        )
+
+    # Only pass dtypes for columns that are actually read
+    header = pd.read_csv(path, nrows=0).columns
+    if read_columns is not None:
+        header = header[header.isin(read_columns)]
+    dtypes = {col: dtype for col, dtype in schema["dtypes"].items() if col in header}
+    dates = [col for col in schema["dates"] if col in header]
+
+    df = pd.read_csv(
+        path, usecols=read_columns, dtype=dtypes, parse_dates=dates, engine=CSV_ENGINE
+    )
+    df = compact_dtypes(df)
+    if name in CALENDAR_DATASETS:
+        df = add_calendar_columns(df)
+    return df if columns is None else df[list(columns)]
+
+
+def add_calendar_columns(df):
+    """
+    Add day_of_week and month (as categoricals) and total_goals to a match
+    level frame, for whichever of them their source columns are present.
+    """
+    if "date" in df:
+        df["day_of_week"] = pd.Categorical(
+            df["date"].dt.day_name(), categories=WEEKDAYS
+        )
+        df["month"] = pd.Categorical(
+            df["date"].dt.month_name(), categories=SEASON_MONTHS, ordered=True
+        )
+    if "home_goals" in df and "away_goals" in df:
+        df["total_goals"] = df["home_goals"] + df["away_goals"]
+    return df
+
+
+def compact_dtypes(df):
+    """
+    Turn low-cardinality strings into categoricals and downcast integer
+    columns to the smallest type that holds them.
+    """
+    df = df.copy()
+    for col in df.columns:
+        dtype = df[col].dtype
+        if col in CATEGORICAL_COLUMNS and (
+            pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+        ):
+            df[col] = df[col].astype("category")
+        elif pd.api.types.is_integer_dtype(dtype):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def memory_usage_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024**2
+
+
+def memory_report(base_path=None, names=None):
+    """
+    Compare the in-memory size of each dataset as parsed by a plain
+    read_csv and after the typed, compacted load.
+    """
+    rows = []
+    for name in names or DATASETS:
+        path = csv_path(name, base_path)
+        if not os.path.exists(path):
+            continue
+        before = memory_usage_mb(pd.read_csv(path))
+        after = memory_usage_mb(read_csv_typed(name, base_path))
+        rows.append(
+            {
+                "dataset": name,
+                "before_mb": round(before, 2),
+                "after_mb": round(after, 2),
+                "saved_pct": round((1 - after / before) * 100, 1),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def snapshot_is_fresh(name, base_path=None):
+    snapshot = snapshot_path(name, base_path)
+    if not os.path.exists(snapshot):
+        return False
+    source = csv_path(name, base_path)
+    if not os.path.exists(source):
+        return True
+    return os.path.getmtime(snapshot) >= os.path.getmtime(source)
+
+
+def ingest_state_path(base_path=None):
+    return os.path.join(base_path or get_data_path(), SNAPSHOT_DIR, INGEST_STATE_FILE)
+
+
+def load_ingest_state(base_path=None):
+    path = ingest_state_path(base_path)
+    if not os.path.exists(path):
+        return {"high_water": {}, "season_versions": {}, "sources": {}, "aliases": {}}
+    with open(path) as f:
+        state = json.load(f)
+    # State files written before content hashing lack these
+    state.setdefault("sources", {})
+    state.setdefault("aliases", {})
+    return state
+
+
+def save_ingest_state(state, base_path=None):
+    path = ingest_state_path(base_path)
+
+    # Write to a temporary file first so readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def season_versions(name, base_path=None):
+    versions = load_ingest_state(base_path)["season_versions"].get(name, {})
+    return {int(season): version for season, version in versions.items()}
+
+
+def record_ingest(state, name, df, seasons):
+    # High-water mark is the latest match date and the last match_id on it
+    latest = df[df["date"] == df["date"].max()]
+    state["high_water"][name] = {
+        "date": latest["date"].max().isoformat(),
+        "match_id": str(latest[INCREMENTAL_KEYS[name]].max()),
+    }
+
+    # Bump the version of every season that received rows, and forget the
+    # seasons that are no longer in the dataset
+    versions = state["season_versions"].setdefault(name, {})
+    for season in seasons:
+        versions[str(season)] = versions.get(str(season), 0) + 1
+    present = {str(int(season)) for season in df["season_id"].dropna().unique()}
+    for season in set(versions) - present:
+        del versions[season]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_stat(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def content_hash(df):
+    """
+    Hash of a parsed frame: its columns, dtypes and values, with floats
+    rounded to CONTENT_HASH_DECIMALS.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(list(zip(df.columns, map(str, df.dtypes)))).encode())
+    floats = df.select_dtypes("float").columns
+    rounded = df.round({col: CONTENT_HASH_DECIMALS for col in floats})
+    rows = pd.util.hash_pandas_object(rounded, index=False)
+    digest.update(rows.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint_source(state, name, base_path=None):
+    """
+    Record the size, mtime and SHA-256 of a dataset's source file. The file
+    is only hashed again when its size or mtime changed.
+    """
+    stat = file_stat(csv_path(name, base_path))
+    recorded = state["sources"].get(name, {})
+    if {key: recorded.get(key) for key in stat} != stat:
+        recorded = {**stat, "sha256": file_sha256(csv_path(name, base_path))}
+    state["sources"][name] = recorded
+    return recorded
+
+
+def find_duplicate(state, name, key, base_path=None):
+    # Only datasets with a fresh snapshot of their own can be shared
+    value = state["sources"][name].get(key)
+    for other, fingerprint in state["sources"].items():
+        if other == name or other in state["aliases"]:
+            continue
+        if not snapshot_is_fresh(other, base_path):
+            continue
+        if value is not None and fingerprint.get(key) == value:
+            return other
+    return None
+
+
+def canonical_name(name, base_path=None):
+    """
+    The dataset whose snapshot holds this dataset's content. That is the
+    dataset itself unless ingest found it to duplicate another one and
+    neither file has changed since.
+    """
+    state = load_ingest_state(base_path)
+    canonical = state["aliases"].get(name)
+    if canonical is None:
+        return name
+
+    fingerprint = state["sources"].get(name, {})
+    path = csv_path(name, base_path)
+    if os.path.exists(path) and {
+        key: fingerprint.get(key) for key in ("size", "mtime")
+    } != file_stat(path):
+        return name
+    if state["sources"].get(canonical, {}).get("content_hash") != fingerprint.get(
+        "content_hash"
+    ):
+        return name
+    return canonical
+
+
+def remove_snapshot(name, base_path=None):
+    path = snapshot_path(name, base_path)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def ingest_order(names):
+    # Partitioned datasets go first, so duplicates share their snapshot and
+    # season reads still get partitions
+    return sorted(names, key=lambda name: name not in PARTITIONED_DATASETS)
+
+
+def dataset_fingerprint(name, base_path=None, season_id=None):
+    """
+    Size and mtime of the file a read of the dataset opens: its fresh
+    snapshot (or the partition of one season), otherwise the source CSV.
+    Loaders key their cache on it, so a changed file is read again.
+    """
+    name = canonical_name(name, base_path)
+    if not snapshot_is_fresh(name, base_path):
+        path = csv_path(name, base_path)
+    elif season_id is not None and name in PARTITIONED_DATASETS:
+        path = partition_path(name, season_id, base_path)
+    else:
+        path = snapshot_path(name, base_path)
+
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def read_dataset(name, base_path=None, columns=None):
+    """
+    Read a dataset from its Parquet snapshot, falling back to the CSV when
+    the snapshot is missing or older than the source file. Duplicates of
+    another dataset read that dataset's snapshot. With columns given, only
+    those columns are read.
+    """
+    start = time.perf_counter()
+    name = canonical_name(name, base_path)
+    if snapshot_is_fresh(name, base_path):
+        source = "snapshot"
+        if name in PARTITIONED_DATASETS:
+            df = read_partitions(name, base_path=base_path, columns=columns)
+        else:
+            df = pd.read_parquet(snapshot_path(name, base_path), columns=columns)
+    else:
+        source = DATASETS[name]
+        logging.info(f"No fresh snapshot for {name}, reading {source}")
+        df = read_csv_typed(name, base_path, columns)
+
+    logging.info(f"Read {name} from {source} in {time.perf_counter() - start:.3f}s")
+    return df
+
+
+def read_datasets(names, base_path=None, max_workers=None):
+    """
+    Read several datasets concurrently on a thread pool and return them as
+    {name: frame}. Each read logs its own timing.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = executor.map(lambda name: read_dataset(name, base_path), names)
+        datasets = dict(zip(names, frames))
+
+    logging.info(
+        f"Read {len(datasets)} datasets in {time.perf_counter() - start:.3f}s"
+    )
+    return datasets
+
+
+def load_report(base_path=None, names=None, max_workers=None):
+    """
+    Time each dataset read on its own, then all of them on a thread pool.
+    Returns the per-dataset timings and the parallel wall time.
+    """
+    names = [
+        name
+        for name in names or DATASETS
+        if os.path.exists(csv_path(name, base_path))
+        or snapshot_is_fresh(name, base_path)
+    ]
+
+    rows = []
+    for name in names:
+        start = time.perf_counter()
+        df = read_dataset(name, base_path)
+        rows.append(
+            {
+                "dataset": name,
+                "rows": len(df),
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+        )
+
+    start = time.perf_counter()
+    read_datasets(names, base_path, max_workers)
+    return pd.DataFrame(rows), time.perf_counter() - start
+
+
+def read_season(name, season_id, base_path=None, columns=None):
+    return read_season_range(name, (season_id, season_id), base_path, columns)
+
+
+def read_season_range(name, season_range, base_path=None, columns=None):
+    """
+    Read the seasons inside an inclusive range. Partitioned snapshots only
+    open the files for those seasons.
+    """
+    name = canonical_name(name, base_path)
+    if snapshot_is_fresh(name, base_path):
+        if name in PARTITIONED_DATASETS:
+            return read_partitions(name, season_range, base_path, columns)
+        return pd.read_parquet(
+            snapshot_path(name, base_path),
+            columns=columns,
+            filters=[
+                ("season_id", ">=", season_range[0]),
+                ("season_id", "<=", season_range[1]),
+            ],
+        )
+
+    # The CSV has to be filtered after parsing, so season_id is always read
+    read_columns = columns
+    if columns is not None and "season_id" not in columns:
+        read_columns = list(columns) + ["season_id"]
+    df = read_csv_typed(name, base_path, read_columns)
+    df = df[df["season_id"].between(*season_range)].reset_index(drop=True)
+    return df if columns is None else df[columns]
+
+
+def available_seasons(name, base_path=None):
+    # Seasons recorded at ingest avoid reading the dataset at all
+    versions = season_versions(name, base_path)
+    if versions:
+        return sorted(versions)
+
+    name = canonical_name(name, base_path)
+    if snapshot_is_fresh(name, base_path):
+        if name in PARTITIONED_DATASETS:
+            return partition_seasons(name, base_path)
+        season_ids = pd.read_parquet(
+            snapshot_path(name, base_path), columns=["season_id"]
+        )["season_id"]
+    else:
+        season_ids = pd.read_csv(csv_path(name, base_path), usecols=["season_id"])[
+            "season_id"
+        ]
+    return sorted(int(season) for season in season_ids.unique())
+
+
+def build_snapshots(base_path=None, names=None):
+    """
+    Convert the CSVs in the data directory into typed Parquet snapshots. A
+    file with the same bytes or parsed content as one that already has a
+    snapshot is recorded as an alias of it instead of being stored twice.
+    """
+    base_path = base_path or get_data_path()
+    os.makedirs(os.path.join(base_path, SNAPSHOT_DIR), exist_ok=True)
+    state = load_ingest_state(base_path)
+
+    built = []
+    for name in ingest_order(names or DATASETS):
+        if not os.path.exists(csv_path(name, base_path)):
+            logging.warning(f"Skipping {name}: {DATASETS[name]} not found")
+            continue
+
+        fingerprint = fingerprint_source(state, name, base_path)
+        state["aliases"].pop(name, None)
+
+        # Byte-identical files are not even parsed
+        canonical = find_duplicate(state, name, "sha256", base_path)
+        if canonical is not None:
+            fingerprint["content_hash"] = state["sources"][canonical]["content_hash"]
+            df = read_dataset(canonical, base_path)
+        else:
+            df = read_csv_typed(name, base_path)
+            fingerprint["content_hash"] = content_hash(df)
+            canonical = find_duplicate(state, name, "content_hash", base_path)
+
+        if canonical is not None:
+            state["aliases"][name] = canonical
+            remove_snapshot(name, base_path)
+            print(f"{name} has the same content as {canonical}, sharing its snapshot")
+        elif name in PARTITIONED_DATASETS:
+            write_partitions(name, df, base_path)
+            print(f"Wrote snapshot for {name}: {len(df)} rows")
+        else:
+            write_parquet(df, snapshot_path(name, base_path))
+            print(f"Wrote snapshot for {name}: {len(df)} rows")
+        built.append(name)
+
+        # A full rebuild touches every season
+        if name in INCREMENTAL_KEYS:
+            seasons = sorted(int(season) for season in df["season_id"].unique())
+            record_ingest(state, name, df, seasons)
+
+        # Save as we go so later datasets can be matched against this one
+        save_ingest_state(state, base_path)
+
+    return built
+
+
+def comparable(df):
+    # Values as strings for comparing rows, with floats rounded like
+    # content_hash so a re-exported CSV's last-digit drift is not a change
+    floats = df.select_dtypes("float").columns
+    return df.round({col: CONTENT_HASH_DECIMALS for col in floats}).astype(str)
+
+
+def history_unchanged(source, existing, key, since):
+    """
+    Whether the source rows before the high-water date still match the
+    snapshot. Edits there are not picked up by an upsert and need a rebuild.
+    """
+    old = source[source["date"] < since].set_index(key)
+    stored = existing[existing["date"] < since].set_index(key)
+    if len(old) != len(stored) or not old.index.isin(stored.index).all():
+        return False
+    stored = stored.loc[old.index, old.columns]
+    return bool((comparable(old) == comparable(stored)).all(axis=None))
+
+
+def ingest_incremental(name, base_path=None):
+    """
+    Upsert the matches on or after the high-water mark into the snapshot of
+    an incremental dataset and bump the version of the seasons they belong
+    to. Returns the affected seasons.
+    """
+    base_path = base_path or get_data_path()
+    key = INCREMENTAL_KEYS[name]
+    snapshot = snapshot_path(name, base_path)
+    state = load_ingest_state(base_path)
+    high_water = state["high_water"].get(name)
+
+    # Nothing to increment from yet, so build the full snapshot. Duplicates
+    # are rebuilt too, which checks whether they still match their original.
+    if high_water is None or name in state["aliases"] or not os.path.exists(snapshot):
+        build_snapshots(base_path, [name])
+        return season_versions(name, base_path)
+
+    source = read_csv_typed(name, base_path)
+    since = pd.Timestamp(high_water["date"])
+
+    # Rows from the high-water date are re-read so late corrections are kept
+    new_rows = source[source["date"] >= since]
+    if name in PARTITIONED_DATASETS:
+        existing = read_partitions(name, base_path=base_path)
+    else:
+        existing = pd.read_parquet(snapshot)
+    if name in CALENDAR_DATASETS:
+        # Snapshots written before the derived columns existed lack them
+        existing = add_calendar_columns(existing)
+
+    # Older rows that were edited or removed can only be applied by a rebuild
+    if not history_unchanged(source, existing, key, since):
+        print(f"Rows before the high-water mark changed in {name}, rebuilding")
+        build_snapshots(base_path, [name])
+        return season_versions(name, base_path)
+
+    # Drop re-read rows that are identical to what is already stored
+    candidates = new_rows.set_index(key)
+    known = candidates[candidates.index.isin(existing[key])]
+    previous = existing.set_index(key).loc[known.index, known.columns]
+    unchanged = known.index[(comparable(known) == comparable(previous)).all(axis=1)]
+    new_rows = new_rows[~new_rows[key].isin(unchanged)]
+
+    if new_rows.empty:
+        # Every row matches the snapshot, so mark it as up to date with the
+        # source file. The content is the same, so is its hash.
+        previous_hash = state["sources"].get(name, {}).get("content_hash")
+        os.utime(snapshot)
+        fingerprint_source(state, name, base_path)["content_hash"] = previous_hash
+        save_ingest_state(state, base_path)
+        print(f"No new rows for {name}")
+        return []
+
+    df = pd.concat(
+        [existing[~existing[key].isin(new_rows[key])], new_rows], ignore_index=True
+    )
+    df = compact_dtypes(df)
+    seasons = sorted(int(season) for season in new_rows["season_id"].unique())
+
+    # Only the partitions of the affected seasons are rewritten
+    if name in PARTITIONED_DATASETS:
+        write_partitions(name, df, base_path, seasons)
+    else:
+        write_parquet(df, snapshot)
+    record_ingest(state, name, df, seasons)
+    fingerprint_source(state, name, base_path)["content_hash"] = content_hash(df)
+    save_ingest_state(state, base_path)
+
+    print(f"Upserted {len(new_rows)} rows into {name} for seasons {seasons}")
+    return seasons
+
+
+def refresh_changed(base_path=None):
+    """
+    Re-ingest the datasets whose source CSV changed since their snapshot was
+    written, incrementally where supported. Returns the refreshed names.
+    """
+    base_path = base_path or get_data_path()
+    changed = [
+        name
+        for name in DATASETS
+        if os.path.exists(csv_path(name, base_path))
+        and not snapshot_is_fresh(canonical_name(name, base_path), base_path)
+    ]
+
+    for name in ingest_order(changed):
+        if name in INCREMENTAL_KEYS:
+            ingest_incremental(name, base_path)
+        else:
+            build_snapshots(base_path, [name])
+    return changed
+
+
+def watch(interval, base_path=None, refresh=refresh_changed):
+    # Poll the data directory until the process exits. refresh returns the
+    # names of what it refreshed.
+    while True:
+        try:
+            changed = refresh(base_path)
+            if changed:
+                logging.info(f"Refreshed changed datasets: {', '.join(changed)}")
+        except Exception:
+            logging.exception("Refreshing changed datasets failed")
+        time.sleep(interval)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Build typed data snapshots")
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="print memory usage before and after dtype compaction",
+    )
+    parser.add_argument(
+        "--timing",
+        action="store_true",
+        help="time each dataset read, one after another and in parallel",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="threads used by --timing for the parallel read",
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        metavar="SECONDS",
+        help="keep running and re-ingest changed files every SECONDS",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only upsert new matches into the match level snapshots",
+    )
+    args = parser.parse_args()
+
+    if args.report:
+        print(memory_report().to_string(index=False))
+        return
+
+    if args.timing:
+        report, parallel = load_report(max_workers=args.workers)
+        print(report.to_string(index=False))
+        print(f"Sequential: {report['seconds'].sum():.3f}s")
+        print(f"Parallel:   {parallel:.3f}s")
+        return
+
+    if args.watch:
+        watch(args.watch)
+        return
+
+    if args.incremental:
+        for name in ingest_order(INCREMENTAL_KEYS):
+            ingest_incremental(name)
+        return
+
+    build_snapshots()
+
+
+if __name__ == "__main__":
+    main()
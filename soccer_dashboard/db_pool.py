@@ -0,0 +1,77 @@
+import logging
+import threading
+
+import streamlit as st
+from sqlalchemy import create_engine, event, text
+
+from config import (
+    DB_PARAMS,
+    DB_POOL_SIZE,
+    DB_POOL_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_STATEMENT_TIMEOUT_MS,
+)
+
+# Pool event counters, updated by the listeners registered in get_engine()
+_metrics = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+_metrics_lock = threading.Lock()
+
+
+def _count(metric):
+    with _metrics_lock:
+        _metrics[metric] += 1
+
+
+@st.cache_resource
+def get_engine():
+    """
+    Create the process-wide SQLAlchemy engine. st.cache_resource shares it
+    across sessions and reruns, so connections are reused instead of being
+    opened on every query.
+    """
+    engine = create_engine(
+        "postgresql://{user}:{password}@{host}:{port}/{database}".format(**DB_PARAMS),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        # Test each connection on checkout and replace it if it has gone stale
+        pool_pre_ping=True,
+        connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+    )
+
+    event.listen(engine, "connect", lambda *args: _count("connects"))
+    event.listen(engine, "checkout", lambda *args: _count("checkouts"))
+    event.listen(engine, "checkin", lambda *args: _count("checkins"))
+    event.listen(engine.pool, "invalidate", lambda *args: _count("invalidations"))
+
+    logging.info(
+        f"Created database pool (size={DB_POOL_SIZE}, overflow={DB_POOL_MAX_OVERFLOW})"
+    )
+    return engine
+
+
+def check_health():
+    try:
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        logging.exception("Database health check failed")
+        return False
+
+
+def pool_metrics():
+    pool = get_engine().pool
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics.update(
+        {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+        }
+    )
+    return metrics
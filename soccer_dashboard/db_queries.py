@@ -0,0 +1,74 @@
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+from data_store import compact_dtypes
+from db_pool import get_engine
+
+# SQL source for each dataset in the tables written by store_data_psql.py.
+# Shots get the player's most common non-Sub position, like load_shots().
+SOURCES = {
+    "players_matches": "players_stats",
+    "shots": """(
+        SELECT shots.*, positions.position
+        FROM shots_events AS shots
+        LEFT JOIN (
+            SELECT DISTINCT ON (player_id) player_id, position
+            FROM players_stats
+            GROUP BY player_id, position
+            ORDER BY player_id, position = 'Sub', count(*) DESC
+        ) AS positions USING (player_id)
+    )""",
+}
+
+# How long query results stay cached, in seconds
+QUERY_TTL = 600
+
+
+def build_where(filters):
+    """
+    Turn {column: value} filters into a parameterised WHERE clause. "All" and
+    None are skipped, tuples are inclusive ranges and lists are IN filters.
+    """
+    clauses = []
+    params = {}
+    for column, value in filters.items():
+        if value is None or value == "All":
+            continue
+        if isinstance(value, tuple):
+            clauses.append(f'"{column}" BETWEEN :{column}_min AND :{column}_max')
+            params[f"{column}_min"], params[f"{column}_max"] = value
+        elif isinstance(value, list):
+            clauses.append(f'"{column}" = ANY(:{column})')
+            params[column] = value
+        else:
+            clauses.append(f'"{column}" = :{column}')
+            params[column] = value
+
+    if not clauses:
+        return "", params
+    return "WHERE " + " AND ".join(clauses), params
+
+
+@st.cache_data(ttl=QUERY_TTL)
+def select_rows(name, filters, columns=None):
+    where, params = build_where(filters)
+    projection = "*" if columns is None else ", ".join(f'"{col}"' for col in columns)
+    sql = f"SELECT {projection} FROM {SOURCES[name]} AS source {where}"
+
+    with get_engine().connect() as conn:
+        df = pd.read_sql(text(sql), conn, params=params)
+    return compact_dtypes(df)
+
+
+@st.cache_data(ttl=QUERY_TTL)
+def select_distinct(name, column, filters):
+    where, params = build_where(filters)
+    sql = (
+        f'SELECT DISTINCT "{column}" FROM {SOURCES[name]} AS source {where} '
+        f'ORDER BY "{column}"'
+    )
+
+    with get_engine().connect() as conn:
+        df = pd.read_sql(text(sql), conn, params=params)
+    return df[column].dropna().tolist()
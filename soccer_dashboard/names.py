@@ -0,0 +1,57 @@
+import re
+from functools import lru_cache
+
+import pandas as pd
+from unidecode import unidecode
+
+# Punctuation dropped from name keys, so "N'Golo" and "N Golo" agree
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+# Player names repeat across squads, seasons and reruns, so each distinct
+# name is only transliterated and keyed once per process
+@lru_cache(maxsize=None)
+def transliterate(name):
+    return unidecode(name)
+
+
+@lru_cache(maxsize=None)
+def name_key(name):
+    """
+    The key names are matched on: transliterated to ASCII, casefolded,
+    without punctuation and with the words sorted, so "Ødegaard, Martin"
+    and "Martin Odegaard" give the same key.
+    """
+    words = PUNCTUATION.sub(" ", transliterate(name)).casefold().split()
+    return " ".join(sorted(words))
+
+
+def map_unique(values, func):
+    # Apply func once per distinct value and broadcast back, keeping NaN
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    mapped = pd.Series([func(value) for value in uniques], dtype=object)
+    return mapped.reindex(codes).set_axis(values.index)
+
+
+def transliterate_names(values):
+    return map_unique(values, transliterate)
+
+
+def name_keys(values):
+    return map_unique(values, name_key)
+
+
+def build_name_index(names, ids):
+    # Hash index from name key to id; the first id wins for a shared key
+    keys = name_keys(names)
+    index = {}
+    for key, id_ in zip(keys, ids):
+        if isinstance(key, str):
+            index.setdefault(key, id_)
+    return index
+
+
+def key_by_id(mapping, index):
+    # Re-key a {name key: value} mapping by id through a name index
+    return {index[key]: value for key, value in mapping.items() if key in index}
@@ -0,0 +1,297 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import api_cache
+from config import (
+    API_BACKOFF,
+    API_BACKOFF_MAX,
+    API_BASE_URL,
+    API_BREAKER_COOLDOWN,
+    API_BREAKER_FAILURES,
+    API_BURST,
+    API_CACHE_MAX_BYTES,
+    API_CACHE_TTL,
+    API_CONCURRENCY,
+    API_KEY,
+    API_RATE_LIMIT,
+    API_RETRIES,
+    API_STALE_FACTOR,
+    API_TIMEOUT,
+    API_WARMER,
+)
+
+BASE_URL = f"{API_BASE_URL}/{API_KEY}"
+
+# Responses worth retrying: throttled, or a server that may recover
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+# Endpoints whose responses are kept for the life of the process. Team
+# lookups are repeated for every squad and hardly ever change.
+MEMO_ENDPOINTS = ["lookupteam.php"]
+
+# Lookups of MEMO_ENDPOINTS made or in flight, as futures keyed by call
+_memo = {}
+_memo_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of making a request while the API is failing."""
+
+
+class TokenBucket:
+    """
+    Lets requests through at rate per second on average, with bursts of up
+    to capacity. acquire() blocks until a request may go out.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after max_failures failed requests in a row, so callers fail fast
+    instead of waiting on timeouts. After cooldown seconds one request is let
+    through: it closes the breaker if it succeeds and reopens it otherwise.
+    """
+
+    def __init__(self, max_failures, cooldown):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def check(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise CircuitOpenError("TheSportsDB is failing, not sending requests")
+            # Half open: this request is the trial, the rest wait another cooldown
+            self.opened_at = time.monotonic()
+
+    def record(self, ok):
+        with self.lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                if self.opened_at is None:
+                    logging.warning("Opening the TheSportsDB circuit breaker")
+                self.opened_at = time.monotonic()
+
+
+_bucket = TokenBucket(API_RATE_LIMIT, API_BURST)
+_breaker = CircuitBreaker(API_BREAKER_FAILURES, API_BREAKER_COOLDOWN)
+
+
+def get_session():
+    # One keep-alive session for the process, with a connection per worker
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=API_CONCURRENCY)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+    return _session
+
+
+def backoff(attempt):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(API_BACKOFF_MAX, API_BACKOFF * 2**attempt))
+
+
+def retry_after(response):
+    try:
+        return min(API_BACKOFF_MAX, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
+
+
+def send(url, headers=None, timeout=API_TIMEOUT):
+    """
+    GET a URL through the shared session within the rate limit. Throttled
+    and server error responses and connection failures are retried up to
+    API_RETRIES times with backoff, so a call takes at most about
+    (API_RETRIES + 1) * (timeout + API_BACKOFF_MAX) seconds. Other error
+    statuses are returned to the caller.
+    """
+    for attempt in range(API_RETRIES + 1):
+        _breaker.check()
+        _bucket.acquire()
+        delay = None
+        try:
+            response = get_session().get(url, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                _breaker.record(True)
+                return response
+            error = requests.HTTPError(
+                f"{response.status_code} for {url}", response=response
+            )
+            delay = retry_after(response)
+
+        _breaker.record(False)
+        if attempt == API_RETRIES:
+            raise error
+        time.sleep(backoff(attempt) if delay is None else delay)
+
+
+def endpoint_url(endpoint):
+    return f"{BASE_URL}/{endpoint}"
+
+
+def request_url(endpoint, params=None):
+    # The full URL with its query string, which responses are cached under
+    return requests.Request("GET", endpoint_url(endpoint), params=params).prepare().url
+
+
+def fetch_json(
+    endpoint, params=None, timeout=API_TIMEOUT, refresh=False, max_age=None
+):
+    """
+    GET an endpoint and return its JSON body. Endpoints with a TTL in
+    API_CACHE_TTL are answered from the on-disk cache while fresh, then
+    revalidated with the ETag/Last-Modified the response came with. A stale
+    copy is still used when the API cannot be reached, and straight away
+    when the cache warmer is running, until it is API_STALE_FACTOR times its
+    TTL old. refresh (used by the warmer) revalidates even a fresh copy,
+    unless it is younger than max_age seconds.
+    """
+    url = request_url(endpoint, params)
+    ttl = API_CACHE_TTL.get(endpoint, 0)
+    cached = api_cache.lookup(url) if ttl else None
+    headers = {}
+    if cached is not None:
+        body, etag, last_modified, fetched_at = cached
+        age = time.time() - fetched_at
+        if refresh:
+            fresh = max_age is not None and age < max_age
+        else:
+            # A warmer keeps the cache current, so its copy is served while it
+            # refreshes, but not indefinitely if the warmer has stopped
+            limit = ttl * API_STALE_FACTOR if API_WARMER != "off" else ttl
+            fresh = age < limit
+        if fresh:
+            return json.loads(body)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    try:
+        response = send(url, headers, timeout)
+        if response.status_code == 304 and cached is not None:
+            api_cache.mark_fresh(url)
+            return json.loads(body)
+        response.raise_for_status()
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        if cached is None:
+            raise
+        logging.warning(f"{endpoint} {params} failed, using cached response: {e}")
+        return json.loads(body)
+
+    if ttl:
+        api_cache.store(
+            url,
+            response.content,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            API_CACHE_MAX_BYTES,
+        )
+    return data
+
+
+def call_key(endpoint, params=None):
+    return endpoint, tuple(sorted((params or {}).items()))
+
+
+def forget(key, future):
+    # Failed lookups are not kept, so the next caller tries again
+    if future.result() is None:
+        with _memo_lock:
+            if _memo.get(key) is future:
+                del _memo[key]
+
+
+def fetch_all(
+    calls, max_workers=API_CONCURRENCY, timeout=API_TIMEOUT, refresh=False, max_age=None
+):
+    """
+    Make (endpoint, params) lookups concurrently, at most max_workers at a
+    time, and return their JSON bodies in order. Identical calls are only
+    made once, and calls to MEMO_ENDPOINTS reuse an earlier or in-flight
+    result unless refresh is set (refresh and max_age are passed on to
+    fetch_json). A lookup that fails or times out gives
+    None instead of failing the others.
+    """
+    if not calls:
+        return []
+
+    def fetch(call):
+        endpoint, params = call
+        try:
+            return fetch_json(endpoint, params, timeout, refresh, max_age)
+        except (requests.RequestException, ValueError) as e:
+            logging.warning(f"{endpoint} {params} failed: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        # One future per distinct call, shared with other callers when memoised
+        futures = {}
+        memoised = []
+        with _memo_lock:
+            for endpoint, params in calls:
+                key = call_key(endpoint, params)
+                if key in futures:
+                    continue
+                if key in _memo and not refresh:
+                    futures[key] = _memo[key]
+                    continue
+                futures[key] = executor.submit(fetch, (endpoint, params))
+                if endpoint in MEMO_ENDPOINTS:
+                    _memo[key] = futures[key]
+                    memoised.append(key)
+
+        # Outside the lock: a lookup that already failed runs forget right
+        # here, and forget takes _memo_lock itself
+        for key in memoised:
+            futures[key].add_done_callback(partial(forget, key))
+
+        return [futures[call_key(*call)].result() for call in calls]
@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit
+
+from data_store import get_data_path
+
+# Endpoints the dashboard reads, and so the ones that are recorded
+RECORDED_ENDPOINTS = [
+    "lookup_all_teams.php",
+    "lookup_all_players.php",
+    "lookuphonours.php",
+    "lookupteam.php",
+    "lookuptable.php",
+]
+
+# Recordings are kept as <endpoint>/<query>.json under this folder
+RECORDINGS_DIR = "sportsdb_recordings"
+
+DEFAULT_PORT = 8765
+
+
+def recordings_path(base_path=None):
+    return os.path.join(base_path or get_data_path(), RECORDINGS_DIR)
+
+
+def canonical_query(query):
+    # Parameters in a fixed order, so a call matches its recording however
+    # the client ordered them
+    return urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def recording_file(directory, endpoint, query):
+    name = quote(canonical_query(query), safe="=&") or "_"
+    return os.path.join(directory, endpoint, f"{name}.json")
+
+
+def export(directory):
+    """
+    Write every cached response from the configured API for
+    RECORDED_ENDPOINTS to directory. Returns how many were written.
+    """
+    # Imported here, as the client loads config, so serving needs neither
+    # the dashboard's settings nor the network
+    import api_cache
+    from sportsdb_client import BASE_URL
+
+    count = 0
+    for url, body in api_cache.entries(f"{BASE_URL}/"):
+        parts = urlsplit(url)
+        endpoint = parts.path.rsplit("/", 1)[-1]
+        if endpoint not in RECORDED_ENDPOINTS:
+            continue
+        path = recording_file(directory, endpoint, parts.query)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(body)
+        count += 1
+    return count
+
+
+def record(directory):
+    """
+    Fetch everything the dashboard reads from the API (the cache warmer's
+    crawl, revalidating every cached copy however recent) and save each
+    response.
+    """
+    from cache_warmer import JOBS, warm
+
+    warm(intervals=dict.fromkeys(JOBS, 0))
+    count = export(directory)
+    logging.info(f"Recorded {count} responses to {directory}")
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """
+    Answers /api/v1/json/<key>/<endpoint>?<query> with the recorded body,
+    after the injected latency and failing with a 503 at the error rate.
+    Calls that were not recorded get a 404.
+    """
+
+    directory = None
+    latency = 0
+    jitter = 0
+    error_rate = 0
+    rng = random.Random()
+    rng_lock = threading.Lock()
+
+    def do_GET(self):
+        with self.rng_lock:
+            delay = self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter))
+            fail = self.rng.random() < self.error_rate
+        time.sleep(max(0, delay))
+
+        if fail:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        parts = urlsplit(self.path)
+        endpoint = unquote(parts.path.rsplit("/", 1)[-1])
+        path = recording_file(self.directory, endpoint, parts.query)
+        if endpoint not in RECORDED_ENDPOINTS or not os.path.exists(path):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        with open(path, "rb") as f:
+            body = f.read()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+def serve(directory, port=DEFAULT_PORT, latency=0, jitter=0, error_rate=0, seed=None):
+    handler = type(
+        "Handler",
+        (ReplayHandler,),
+        {
+            "directory": directory,
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "rng": random.Random(seed),
+        },
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    logging.info(
+        f"Replaying {directory} at http://127.0.0.1:{port}/api/v1/json "
+        f"(latency {latency}s ±{jitter:.0%}, error rate {error_rate:.0%})"
+    )
+    server.serve_forever()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description="Record TheSportsDB responses and replay them locally"
+    )
+    parser.add_argument(
+        "--dir",
+        default=recordings_path(),
+        help="folder the recordings are kept in",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "record", help="fetch from API_BASE_URL and save every response"
+    )
+    serve_parser = commands.add_parser(
+        "serve",
+        help="replay the recordings; set API_BASE_URL to the printed URL",
+    )
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument(
+        "--latency", type=float, default=0, help="seconds added to every response"
+    )
+    serve_parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0,
+        help="vary the latency by up to this fraction either way",
+    )
+    serve_parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="fraction of requests answered with a 503",
+    )
+    serve_parser.add_argument(
+        "--seed", type=int, help="seed for the latency and errors, for repeat runs"
+    )
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.dir)
+        return
+    serve(
+        args.dir, args.port, args.latency, args.jitter, args.error_rate, args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import logging
+
+import pandas as pd
+
+from aggregations import (
+    ASSIST_SHOT_KEYS,
+    PLAYER_SHOT_KEYS,
+    assist_shot_profiles,
+    player_shot_profiles,
+    team_match_totals,
+    team_season_summary,
+)
+from data_store import (
+    DATASETS,
+    PARTITIONED_DATASETS,
+    canonical_name,
+    csv_path,
+    partition_files,
+    snapshot_is_fresh,
+    snapshot_path,
+)
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Columns the shot profiles are pivoted on, in the order the pandas
+# transforms merge them
+SHOT_DIMENSIONS = ["situation", "body_part", "zone_y", "result"]
+
+# Home and away columns of a match row, mapped to the team level names
+# used by process_team_stats
+TEAM_MATCH_COLUMNS = {
+    "points": ("home_points", "away_points"),
+    "xPoints": ("home_expected_points", "away_expected_points"),
+    "goals": ("home_goals", "away_goals"),
+    "GA": ("away_goals", "home_goals"),
+    "xG": ("home_xg", "away_xg"),
+    "npxG": ("home_np_xg", "away_np_xg"),
+    "npxGD": ("home_np_xg_difference", "away_np_xg_difference"),
+    "ppda": ("home_ppda", "away_ppda"),
+    "ppda_against": ("away_ppda", "home_ppda"),
+    "deep_completions": ("home_deep_completions", "away_deep_completions"),
+    "deep_completions_allowed": ("away_deep_completions", "home_deep_completions"),
+}
+
+# Team level columns that are averaged rather than summed
+TEAM_MEAN_COLUMNS = ["ppda", "ppda_against"]
+
+_connection = None
+
+
+def is_available():
+    return duckdb is not None
+
+
+def get_connection():
+    global _connection
+    if _connection is None:
+        if duckdb is None:
+            raise ImportError("duckdb is not installed")
+        _connection = duckdb.connect()
+    # Cursors are cheap and safe to use from several threads at once
+    return _connection.cursor()
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def sql_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def source(name, base_path=None, season_range=None):
+    """
+    Table expression for a dataset: its Parquet snapshot if fresh, otherwise
+    the source CSV, both scanned directly by DuckDB. Partitioned snapshots
+    only scan the season files inside season_range.
+    """
+    name = canonical_name(name, base_path)
+    if snapshot_is_fresh(name, base_path):
+        if name in PARTITIONED_DATASETS:
+            files = partition_files(name, season_range, base_path)
+            if files:
+                return f"read_parquet([{', '.join(map(sql_string, files))}])"
+            path = f"{snapshot_path(name, base_path)}/*.parquet"
+            return f"read_parquet({sql_string(path)})"
+        return f"read_parquet({sql_string(snapshot_path(name, base_path))})"
+    return f"read_csv_auto({sql_string(csv_path(name, base_path))})"
+
+
+def team_season_totals(season_range, base_path=None):
+    """
+    Per team and season totals from the team_stats matches, the same frame
+    process_team_stats builds by stacking home and away rows.
+    """
+    sides = []
+    for side in range(2):
+        team = "home_team" if side == 0 else "away_team"
+        columns = ", ".join(
+            f"{quote(pair[side])} AS {quote(name)}"
+            for name, pair in TEAM_MATCH_COLUMNS.items()
+        )
+        sides.append(
+            f"SELECT {team} AS team, season_id, {columns} "
+            f"FROM {source('team_stats', base_path, season_range)} "
+            "WHERE season_id BETWEEN ? AND ?"
+        )
+
+    aggregates = ", ".join(
+        f"avg({quote(name)}) AS {quote(name)}"
+        if name in TEAM_MEAN_COLUMNS
+        else f"sum({quote(name)}) AS {quote(name)}"
+        for name in TEAM_MATCH_COLUMNS
+    )
+    sql = (
+        f"WITH matches AS ({sides[0]} UNION ALL {sides[1]}) "
+        f"SELECT team, season_id, {aggregates} FROM matches "
+        "GROUP BY team, season_id ORDER BY team, season_id"
+    )
+    params = [season_range[0], season_range[1]] * 2
+    return get_connection().execute(sql, params).df()
+
+
+def team_summary(base_path=None, columns=None):
+    """
+    Sum of every numeric players_summary column (or only the given columns)
+    per team and season, as in data_access.load_team_summary.
+    """
+    cursor = get_connection()
+    table = source("players_summary", base_path)
+
+    # Sum every numeric column, like DataFrame.sum(numeric_only=True)
+    numeric = columns
+    if numeric is None:
+        described = cursor.execute(f"DESCRIBE SELECT * FROM {table}").df()
+        numeric = described[
+            described["column_type"].str.contains("INT|DOUBLE|FLOAT|DECIMAL")
+        ]["column_name"]
+    aggregates = ", ".join(
+        f"sum({quote(col)}) AS {quote(col)}"
+        for col in numeric
+        if col not in ("team", "season_id")
+    )
+
+    sql = (
+        f"SELECT team, season_id, {aggregates} FROM {table} "
+        "GROUP BY team, season_id ORDER BY team, season_id"
+    )
+    return cursor.execute(sql).df()
+
+
+def shot_xg_profile(df_shots, keys, value="xg", with_matches=False):
+    """
+    Per shot xG of each key group broken down by situation, body part, zone
+    and result, in one query instead of four pivot tables and their merges.
+    Matches the output of transform_shot_data and transform_shot_data_assist.
+    """
+    cursor = get_connection()
+    cursor.register("shots", df_shots)
+
+    key_list = ", ".join(quote(key) for key in keys)
+    dimension_list = ", ".join(quote(dim) for dim in SHOT_DIMENSIONS)
+    # pandas drops groups with a missing key, so skip those rows here too
+    not_null = " AND ".join(
+        f"{quote(col)} IS NOT NULL" for col in keys + SHOT_DIMENSIONS
+    )
+    keys_not_null = " AND ".join(f"{quote(key)} IS NOT NULL" for key in keys)
+
+    # One averaged column per observed value of each dimension
+    aggregates = []
+    params = []
+    for dim in SHOT_DIMENSIONS:
+        values = cursor.execute(
+            f"SELECT DISTINCT {quote(dim)} FROM shots "
+            f"WHERE {quote(dim)} IS NOT NULL ORDER BY 1"
+        ).fetchall()
+        for (val,) in values:
+            aggregates.append(
+                f"coalesce(avg(per_shot_xg) FILTER (WHERE {quote(dim)} = ?), 0) "
+                f"AS {quote(f'{val} xG')}"
+            )
+            params.append(val)
+
+    sql = (
+        f"WITH grouped AS ("
+        f"SELECT {key_list}, {dimension_list}, "
+        f"sum({quote(value)}) / count({quote(value)}) AS per_shot_xg "
+        f"FROM shots WHERE {not_null} GROUP BY {key_list}, {dimension_list}) "
+        f"SELECT {key_list}, {', '.join(aggregates)} FROM grouped "
+        f"GROUP BY {key_list}"
+    )
+    if with_matches:
+        sql = (
+            f"SELECT profile.*, matches.matches FROM ({sql}) AS profile "
+            f"LEFT JOIN (SELECT {key_list}, count(DISTINCT game) AS matches "
+            f"FROM shots WHERE {keys_not_null} GROUP BY {key_list}) AS matches "
+            f"USING ({key_list})"
+        )
+
+    df = cursor.execute(f"{sql} ORDER BY {key_list}", params).df()
+    cursor.unregister("shots")
+    return df
+
+
+# Parity checks against the pandas code in aggregations
+
+
+def assert_same(name, expected, actual, keys):
+    expected = expected.sort_values(keys).reset_index(drop=True)
+    actual = actual.sort_values(keys).reset_index(drop=True)[expected.columns]
+    pd.testing.assert_frame_equal(
+        expected.astype({key: str for key in keys}),
+        actual.astype({key: str for key in keys}),
+        check_dtype=False,
+        check_exact=False,
+    )
+    print(f"{name}: {len(actual)} rows match")
+
+
+def check_parity(base_path=None, season_range=(2015, 2023)):
+    """
+    Run every DuckDB aggregation next to the pandas code the app runs
+    otherwise and raise if the results differ.
+    """
+    # Imported here: data_access imports this module
+    from data_access import load_shots
+    from data_store import read_dataset
+
+    df_team_stats = read_dataset("team_stats", base_path)
+    in_range = df_team_stats["season_id"].between(*season_range)
+    assert_same(
+        "team_season_totals",
+        team_match_totals(df_team_stats[in_range]),
+        team_season_totals(season_range, base_path),
+        ["team", "season_id"],
+    )
+
+    df_summary = read_dataset("players_summary", base_path)
+    assert_same(
+        "team_summary",
+        team_season_summary(df_summary),
+        team_summary(base_path),
+        ["team", "season_id"],
+    )
+
+    try:
+        # With the position column the app adds from players_matches
+        df_shots = load_shots()
+    except FileNotFoundError:
+        logging.warning(f"Skipping shot profiles: {DATASETS['shots']} not found")
+        return
+
+    for name, profiles, keys in [
+        ("player", player_shot_profiles, PLAYER_SHOT_KEYS),
+        ("assist", assist_shot_profiles, ASSIST_SHOT_KEYS),
+    ]:
+        by_key, by_team = profiles(df_shots)
+        assert_same(
+            f"{name} shot profiles",
+            by_key,
+            shot_xg_profile(df_shots, keys, with_matches=True),
+            keys,
+        )
+        assert_same(
+            f"{name} team shot profiles",
+            by_team,
+            shot_xg_profile(df_shots, ["team"]),
+            ["team"],
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    check_parity()
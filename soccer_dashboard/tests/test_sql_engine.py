@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregations import (
+    ASSIST_SHOT_KEYS,
+    PLAYER_SHOT_KEYS,
+    assist_shot_profiles,
+    player_shot_profiles,
+    team_match_totals,
+    team_season_summary,
+)
+from data_store import compact_dtypes
+import sql_engine
+
+pytest.importorskip("duckdb")
+
+TEAMS = ["Arsenal", "Chelsea", "Everton", "Fulham"]
+
+
+def make_matches(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "season_id": rng.choice([2021, 2022, 2023], n),
+            "home_team": rng.choice(TEAMS, n),
+            "away_team": rng.choice(TEAMS, n),
+        }
+    )
+    for home, away in sql_engine.TEAM_MATCH_COLUMNS.values():
+        for col in (home, away):
+            if col not in df:
+                df[col] = rng.random(n) * 3
+    return df
+
+
+def make_shots(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    players = [f"Player {i}" for i in range(40)]
+    return pd.DataFrame(
+        {
+            "player": rng.choice(players, n),
+            "team": rng.choice(TEAMS, n),
+            "position": rng.choice(["F", "M", "D", "Sub"], n),
+            "assist_player": rng.choice(players[:10] + [None], n),
+            "situation": rng.choice(["OpenPlay", "SetPiece", "Penalty"], n),
+            "body_part": rng.choice(["RightFoot", "LeftFoot", "Head"], n),
+            "zone_y": rng.choice(["Left", "Centre", "Right"], n),
+            "result": rng.choice(["Goal", "SavedShot", "MissedShots"], n),
+            "xg": rng.random(n),
+            "game": rng.integers(1, 150, n),
+        }
+    )
+
+
+def test_team_season_totals(tmp_path):
+    df = make_matches()
+    df.to_csv(tmp_path / "team_stats.csv", index=False)
+    season_range = (2022, 2023)
+
+    sql_engine.assert_same(
+        "team_season_totals",
+        team_match_totals(df[df["season_id"].between(*season_range)]),
+        sql_engine.team_season_totals(season_range, str(tmp_path)),
+        ["team", "season_id"],
+    )
+
+
+def test_team_summary(tmp_path):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(
+        {
+            "team": rng.choice(TEAMS, 300),
+            "season_id": rng.choice([2022, 2023], 300),
+            "goals": rng.integers(0, 5, 300),
+            "xg": rng.random(300),
+        }
+    )
+    df.to_csv(tmp_path / "players_summary_data.csv", index=False)
+
+    sql_engine.assert_same(
+        "team_summary",
+        team_season_summary(df),
+        sql_engine.team_summary(str(tmp_path)),
+        ["team", "season_id"],
+    )
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+@pytest.mark.parametrize(
+    "profiles, keys",
+    [
+        (player_shot_profiles, PLAYER_SHOT_KEYS),
+        (assist_shot_profiles, ASSIST_SHOT_KEYS),
+    ],
+)
+def test_shot_profiles(profiles, keys, categorical):
+    df_shots = make_shots()
+    if categorical:
+        # As loaded from the snapshots
+        df_shots = compact_dtypes(df_shots)
+
+    by_key, by_team = profiles(df_shots)
+    sql_engine.assert_same(
+        "by key",
+        by_key,
+        sql_engine.shot_xg_profile(df_shots, keys, with_matches=True),
+        keys,
+    )
+    sql_engine.assert_same(
+        "by team",
+        by_team,
+        sql_engine.shot_xg_profile(df_shots, ["team"]),
+        ["team"],
+    )
@@ -0,0 +1,179 @@
+import argparse
+import logging
+import os
+import time
+
+import pandas as pd
+
+from data_store import SNAPSHOT_DIR, compact_dtypes, get_data_path, write_parquet
+
+# Salary files merged into the unified wages table, one per league
+SALARY_FILES = [
+    "premier_league_salaries.csv",
+    "championship_salaries.csv",
+    "la_liga_salaries.csv",
+    "mls_salaries.csv",
+]
+
+# Local exchange rates: the value of one unit of each currency in GBP
+FX_FILE = "fx_rates.csv"
+
+# Suffix of the money columns in each salary file and its currency
+CURRENCY_SUFFIXES = {"gbp": "GBP", "eur": "EUR", "usd": "USD"}
+
+CURRENCY_SYMBOLS = {"GBP": "£", "EUR": "€", "USD": "$"}
+
+# Money columns, stored without their suffix as integer minor units
+# (pence, cents) of the base currency
+MONEY_COLUMNS = [
+    "weekly_gross",
+    "annual_gross",
+    "adjusted_gross",
+    "bonus_gross",
+    "total_gross",
+    "release",
+]
+
+# Text columns kept in the unified table, stored as categoricals
+WAGES_CATEGORIES = [
+    "position",
+    "position_detail",
+    "country",
+    "club",
+    "league",
+    "status",
+    "source_currency",
+    "currency",
+]
+
+WAGES_COLUMNS = (
+    ["name", "age", "season", "years", "signed", "expiration", "active"]
+    + WAGES_CATEGORIES
+    + MONEY_COLUMNS
+)
+
+
+def wages_path(currency, base_path=None):
+    filename = f"wages_{currency.lower()}.parquet"
+    return os.path.join(base_path or get_data_path(), SNAPSHOT_DIR, filename)
+
+
+def parse_money(values):
+    """
+    Parse a money column into integer minor units. Strings like
+    "€ 1,365,385" lose their symbol and separators in one vectorised pass.
+    """
+    if not pd.api.types.is_numeric_dtype(values):
+        digits = values.astype("string").str.replace(r"[^\d.\-]", "", regex=True)
+        values = pd.to_numeric(digits, errors="coerce")
+    return (values * 100).round().astype("Int64")
+
+
+def read_salary_file(path):
+    df = pd.read_csv(path)
+
+    suffix = next(s for s in CURRENCY_SUFFIXES if f"weekly_gross_{s}" in df.columns)
+    df = df.rename(columns={f"{col}_{suffix}": col for col in MONEY_COLUMNS})
+    for col in MONEY_COLUMNS:
+        df[col] = parse_money(df[col])
+    df["source_currency"] = CURRENCY_SUFFIXES[suffix]
+
+    # Seasons come as 2023 or "2020-2021", keep the starting year
+    df["season"] = df["season"].astype(str).str[:4].astype(int)
+    return df
+
+
+def load_fx_rates(base_path=None):
+    path = os.path.join(base_path or get_data_path(), FX_FILE)
+    return pd.read_csv(path).set_index("currency")["rate_to_gbp"]
+
+
+def convert_currency(df, rates, currency):
+    missing = set(df["source_currency"]) - set(rates.index)
+    if currency not in rates.index or missing:
+        raise ValueError(f"No exchange rate for {sorted(missing | {currency})}")
+
+    # One factor per row, applied to every money column at once
+    factor = df["source_currency"].map(rates / rates[currency]).astype(float)
+    df[MONEY_COLUMNS] = df[MONEY_COLUMNS].mul(factor, axis=0).round().astype("Int64")
+    df["currency"] = currency
+    return df
+
+
+def source_files(base_path=None):
+    base_path = base_path or get_data_path()
+    paths = [os.path.join(base_path, filename) for filename in SALARY_FILES]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def normalise_wages(currency, base_path=None):
+    """
+    Combine every league's salary file into one table with the money
+    columns in minor units of the given currency.
+    """
+    frames = [read_salary_file(path) for path in source_files(base_path)]
+    df = pd.concat(frames, ignore_index=True)
+    df = convert_currency(df, load_fx_rates(base_path), currency)
+
+    df = df[WAGES_COLUMNS]
+    df["active"] = df["active"].astype("boolean")
+    df["years"] = df["years"].round().astype("Int64")
+    df[WAGES_CATEGORIES] = df[WAGES_CATEGORIES].astype("category")
+    return compact_dtypes(df)
+
+
+def wages_are_fresh(currency, base_path=None):
+    path = wages_path(currency, base_path)
+    if not os.path.exists(path):
+        return False
+    fx_path = os.path.join(base_path or get_data_path(), FX_FILE)
+    sources = source_files(base_path) + [fx_path]
+    return os.path.getmtime(path) >= max(os.path.getmtime(src) for src in sources)
+
+
+def wages_fingerprint(currency, base_path=None):
+    # Size and mtime of every file the wages table is read or built from
+    fx_path = os.path.join(base_path or get_data_path(), FX_FILE)
+    paths = source_files(base_path) + [fx_path, wages_path(currency, base_path)]
+    stats = [os.stat(path) for path in paths if os.path.exists(path)]
+    return tuple((stat.st_size, stat.st_mtime_ns) for stat in stats)
+
+
+def read_wages(currency, base_path=None):
+    start = time.perf_counter()
+    if wages_are_fresh(currency, base_path):
+        df = pd.read_parquet(wages_path(currency, base_path))
+    else:
+        logging.info(f"No fresh wages table for {currency}, reading the salary files")
+        df = normalise_wages(currency, base_path)
+
+    logging.info(f"Read wages in {currency} in {time.perf_counter() - start:.3f}s")
+    return df
+
+
+def build_wages(currency, base_path=None):
+    df = normalise_wages(currency, base_path)
+
+    path = wages_path(currency, base_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_parquet(df, path)
+    print(f"Wrote wages table in {currency}: {len(df)} rows")
+    return df
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Build the unified wages table")
+    parser.add_argument(
+        "--currency",
+        default="GBP",
+        help="base currency the wages are converted to",
+    )
+    args = parser.parse_args()
+
+    build_wages(args.currency.upper())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,407 @@
+import argparse
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import psycopg2
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import streamlit as st
+from openpyxl import load_workbook
 from sqlalchemy import create_engine
 
 # import db params from soccer_dashboard/config.py
 from soccer_dashboard.config import DB_PARAMS
+from soccer_dashboard.data_store import SCHEMAS
+
+DB_URL = "postgresql://{user}:{password}@{host}:{port}/{database}"
+
+# Workbook behind each table, and the data_store dataset whose schema it has
+XLSX_SOURCES = {
+    "combined_data": ("./data/combined_data.xlsx", "combined_data"),
+    "players_stats": ("./data/players_matches_data.xlsx", "players_matches"),
+    "shots_events": ("./data/shot_events.xlsx", "shots"),
+    "team_stats": ("./data/team_stats.xlsx", "team_stats"),
+}
+
+# Number of rows pulled out of a workbook at a time
+XLSX_CHUNK_SIZE = 10000
+
+# Number of rows streamed per COPY call
+COPY_CHUNK_SIZE = 50000
+
+# Tables that can be upserted incrementally, with the key they conflict on
+UPSERT_KEYS = {
+    "combined_data": "match_id",
+    "team_stats": "match_id",
+    "shots_events": "shot_id",
+}
+
+# Column naming the match a row belongs to, shared by every table
+GAME_COLUMN = "game"
 
-# Load data from Excel files
+# Composite indexes backing the filters the dashboard pushes down to the
+# database (see soccer_dashboard/db_queries.py)
+FILTER_INDEXES = {
+    "players_stats": [
+        ["season_id", "team", "position"],
+        ["player_id", "position"],
+        [GAME_COLUMN],
+    ],
+    "shots_events": [["season_id", "team", "player_id"]],
+}
+
+# Stream the rows of a workbook's first sheet as DataFrames of chunk_size
+# rows, without loading the whole workbook
+def iter_xlsx_chunks(path, chunk_size=XLSX_CHUNK_SIZE):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+def read_xlsx(path, chunk_size=XLSX_CHUNK_SIZE):
+    return pd.concat(iter_xlsx_chunks(path, chunk_size), ignore_index=True)
+
+# Load data from Excel files, one process per workbook since parsing xlsx
+# is pure Python and holds the GIL
 def load_xlsx_data():
     print("Loading data from Excel files...")
-    df = pd.read_excel("./data/combined_data.xlsx")
-    df_players = pd.read_excel("./data/players_matches_data.xlsx")
-    df_shots = pd.read_excel("./data/shot_events.xlsx")
-    df_team_stats = pd.read_excel("./data/team_stats.xlsx")
+    tables = ["combined_data", "players_stats", "shots_events", "team_stats"]
+    with ProcessPoolExecutor(max_workers=len(tables)) as executor:
+        frames = executor.map(read_xlsx, [XLSX_SOURCES[t][0] for t in tables])
+        df, df_players, df_shots, df_team_stats = frames
     return df, df_players, df_shots, df_team_stats
 
+# Arrow schema for a workbook, taken from its first chunk. Excel does not
+# tell whole numbers from floats, so only columns the dataset schema
+# declares as integers are integers (even where the first chunk has a blank
+# cell), and columns empty in the first chunk become strings.
+def arrow_schema(chunk, dataset):
+    integers = {
+        col
+        for col, dtype in SCHEMAS[dataset]["dtypes"].items()
+        if dtype.lower() == "int64"
+    }
+    fields = []
+    for field in pa.Table.from_pandas(chunk, preserve_index=False).schema:
+        if pa.types.is_null(field.type):
+            field = pa.field(field.name, pa.string())
+        elif pa.types.is_integer(field.type) and field.name not in integers:
+            field = pa.field(field.name, pa.float64())
+        elif pa.types.is_floating(field.type) and field.name in integers:
+            field = pa.field(field.name, pa.int64())
+        fields.append(field)
+    return pa.schema(fields)
+
+# Postgres column type for each Arrow type arrow_schema produces
+def postgres_type(arrow_type):
+    if pa.types.is_integer(arrow_type):
+        return "BIGINT"
+    if pa.types.is_floating(arrow_type):
+        return "DOUBLE PRECISION"
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMP"
+    if pa.types.is_date(arrow_type):
+        return "DATE"
+    return "TEXT"
+
+def create_table_sql(schema, table):
+    columns = ", ".join(
+        f'"{field.name}" {postgres_type(field.type)}' for field in schema
+    )
+    return f"CREATE TABLE {table} ({columns})"
+
+# A chunk cast to the workbook's schema, as an Arrow table and as a frame
+# for COPY. Integers stay nullable integers, so a blank cell does not turn
+# 30 into 30.0.
+def cast_chunk(chunk, schema):
+    table = pa.Table.from_pandas(chunk, preserve_index=False).cast(schema)
+    df = table.to_pandas(
+        types_mapper=lambda t: pd.Int64Dtype() if pa.types.is_integer(t) else None
+    )
+    return table, df
+
+# Convert a workbook chunk by chunk, in one pass, to a Parquet file and/or
+# straight into its Postgres staging table with COPY
+def convert_workbook(
+    path,
+    table,
+    dataset,
+    parquet_path=None,
+    to_postgres=False,
+    chunk_size=XLSX_CHUNK_SIZE,
+):
+    staging = staging_name(table)
+    writer = None
+    conn = None
+    cursor = None
+    schema = None
+    rows = 0
+    try:
+        if to_postgres:
+            conn = psycopg2.connect(**DB_PARAMS)
+            cursor = conn.cursor()
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        for chunk in iter_xlsx_chunks(path, chunk_size):
+            if schema is None:
+                schema = arrow_schema(chunk, dataset)
+                if parquet_path:
+                    writer = pq.ParquetWriter(parquet_path, schema)
+                if cursor is not None:
+                    cursor.execute(create_table_sql(schema, staging))
+            arrow_chunk, df = cast_chunk(chunk, schema)
+            if writer is not None:
+                writer.write_table(arrow_chunk)
+            if cursor is not None:
+                copy_rows(cursor, df, staging, chunk_size)
+            rows += len(chunk)
+        if conn is not None:
+            conn.commit()
+    finally:
+        if writer is not None:
+            writer.close()
+        if conn is not None:
+            conn.close()
+
+    if parquet_path:
+        print(f"Converted {path} to {parquet_path}: {rows} rows")
+    if to_postgres:
+        print(f"Streamed {rows} rows from {path} into {staging}")
+
+# Convert every workbook concurrently, to Parquet files in parquet_dir
+# and/or straight into Postgres. Each workbook is parsed once for both.
+def convert_workbooks(parquet_dir=None, to_postgres=False, tables=None):
+    tables = tables or list(XLSX_SOURCES)
+    if parquet_dir:
+        os.makedirs(parquet_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=len(tables)) as executor:
+        futures = []
+        for table in tables:
+            path, dataset = XLSX_SOURCES[table]
+            parquet_path = None
+            if parquet_dir:
+                parquet_path = os.path.join(parquet_dir, f"{table}.parquet")
+            futures.append(
+                executor.submit(
+                    convert_workbook, path, table, dataset, parquet_path, to_postgres
+                )
+            )
+        for future in futures:
+            future.result()
+
+    if to_postgres:
+        swap_staging_tables(tables)
+
+def staging_name(table):
+    return f"{table}_staging"
+
+# Stream a frame into an existing table with COPY, chunk_size rows at a time
+def copy_rows(cursor, df, table, chunk_size=COPY_CHUNK_SIZE):
+    columns = ", ".join(f'"{col}"' for col in df.columns)
+    copy_sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    for start in range(0, len(df), chunk_size):
+        buffer = io.StringIO()
+        df.iloc[start : start + chunk_size].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(copy_sql, buffer)
+
+# Create an empty staging table for the frame and stream it in with COPY
+def copy_to_staging(df, table, engine, chunk_size=COPY_CHUNK_SIZE):
+    staging = staging_name(table)
+
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            cursor.execute(pd.io.sql.get_schema(df, staging, con=engine))
+            copy_rows(cursor, df, staging, chunk_size)
+    finally:
+        conn.close()
+
+    print(f"Copied {len(df)} rows into {staging}")
+    return staging
+
+# Swap every staging table in at once, so readers never see a missing or
+# half loaded table
+def swap_staging_tables(tables):
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn, conn.cursor() as cursor:
+            for table in tables:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}_old")
+                cursor.execute(f"ALTER TABLE IF EXISTS {table} RENAME TO {table}_old")
+                cursor.execute(
+                    f"ALTER TABLE {staging_name(table)} RENAME TO {table}"
+                )
+                cursor.execute(f"DROP TABLE IF EXISTS {table}_old")
+    finally:
+        conn.close()
+
+# Load every frame into its staging table in parallel, then swap them in
+def bulk_load(frames, engine):
+    with ThreadPoolExecutor(max_workers=len(frames)) as executor:
+        futures = [
+            executor.submit(copy_to_staging, df, table, engine)
+            for table, df in frames.items()
+        ]
+        for future in futures:
+            future.result()
+
+    swap_staging_tables(frames.keys())
+
+def create_filter_indexes():
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn, conn.cursor() as cursor:
+            for table, indexes in FILTER_INDEXES.items():
+                for columns in indexes:
+                    name = f"{table}_{'_'.join(columns)}_idx"
+                    column_list = ", ".join(f'"{col}"' for col in columns)
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column_list})"
+                    )
+    finally:
+        conn.close()
+
+# Latest match date already loaded into a table, None if it does not exist
+def read_high_water_mark(cursor, table):
+    cursor.execute("SELECT to_regclass(%s)", (table,))
+    if cursor.fetchone()[0] is None:
+        return None
+    cursor.execute(f'SELECT max("date") FROM {table}')
+    return cursor.fetchone()[0]
+
+# Insert new rows and update existing ones, matched on the table's key
+def upsert_frame(df, table, chunk_size=COPY_CHUNK_SIZE):
+    key = UPSERT_KEYS[table]
+    staging = staging_name(table)
+    columns = ", ".join(f'"{col}"' for col in df.columns)
+    updates = ", ".join(
+        f'"{col}" = EXCLUDED."{col}"' for col in df.columns if col != key
+    )
+
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS {table}_{key}_key ON {table} ("{key}")'
+            )
+            cursor.execute(
+                f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) "
+                "ON COMMIT DROP"
+            )
+            copy_rows(cursor, df, staging, chunk_size)
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+                f'ON CONFLICT ("{key}") DO UPDATE SET {updates}'
+            )
+    finally:
+        conn.close()
+
+    print(f"Upserted {len(df)} rows into {table}")
+
+# Replace every row of the given games in a table that has no unique key
+def replace_games(df, table, games, chunk_size=COPY_CHUNK_SIZE):
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE "{GAME_COLUMN}" = ANY(%s)', (games,)
+            )
+            copy_rows(cursor, df, table, chunk_size)
+    finally:
+        conn.close()
+
+    print(f"Replaced {len(df)} rows of {len(games)} games in {table}")
+
+# Only load matches on or after the high-water mark, plus the shot events and
+# player match stats of those games. Falls back to a full load on an empty
+# database.
+def incremental_load(frames, engine):
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn, conn.cursor() as cursor:
+            high_water = {
+                table: read_high_water_mark(cursor, table)
+                for table in ["combined_data", "team_stats"]
+            }
+    finally:
+        conn.close()
+
+    if any(mark is None for mark in high_water.values()):
+        print("No high-water mark found, running a full load")
+        bulk_load(frames, engine)
+        return
+
+    games = set()
+    for table, mark in high_water.items():
+        df = frames[table]
+        new_rows = df[pd.to_datetime(df["date"]) >= pd.Timestamp(mark)]
+        if not new_rows.empty:
+            upsert_frame(new_rows, table)
+            games.update(new_rows[GAME_COLUMN].unique().tolist())
+
+    if not games:
+        return
+
+    df_shots = frames["shots_events"]
+    upsert_frame(df_shots[df_shots[GAME_COLUMN].isin(games)], "shots_events")
+
+    # Player match stats have no unique key, so the rows of each new game
+    # are replaced
+    df_players = frames["players_stats"]
+    replace_games(
+        df_players[df_players[GAME_COLUMN].isin(games)], "players_stats", list(games)
+    )
+
 def main():
+    parser = argparse.ArgumentParser(description="Load match data into PostgreSQL")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only upsert matches newer than the latest one in the database",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream the workbooks into the database chunk by chunk (full load)",
+    )
+    parser.add_argument(
+        "--parquet-dir",
+        help="convert the workbooks to Parquet files in this directory "
+        "(together with --stream, in addition to loading them)",
+    )
+    args = parser.parse_args()
+
+    if args.stream and args.incremental:
+        parser.error("--stream only supports full loads")
+
+    # Streaming never holds a whole workbook in memory
+    if args.stream or args.parquet_dir:
+        convert_workbooks(args.parquet_dir, to_postgres=args.stream)
+        if args.stream:
+            create_filter_indexes()
+            print("Data has been loaded to PostgreSQL successfully")
+        return
+
     # Connect to PostgreSQL
     try:
-        engine = create_engine('postgresql://{user}:{password}@{host}:{port}/{database}'.format(**DB_PARAMS))
+        engine = create_engine(DB_URL.format(**DB_PARAMS))
         print("Database connection successful")
     except Exception as e:
         print("Database connection failed")
@@ -28,16 +411,22 @@ def main():
     # Read the Excel files
     df, df_players, df_shots, df_team_stats = load_xlsx_data()
 
-    # Write the DataFrame to the SQL database
-    df_players.to_sql("players_stats", engine, if_exists="replace", index=False)
-
-    df_shots.to_sql("shots_events", engine, if_exists="replace", index=False)
+    frames = {
+        "players_stats": df_players,
+        "shots_events": df_shots,
+        "team_stats": df_team_stats,
+        "combined_data": df,
+    }
 
-    df_team_stats.to_sql("team_stats", engine, if_exists="replace", index=False)
+    # Write the DataFrames to the SQL database
+    if args.incremental:
+        incremental_load(frames, engine)
+    else:
+        bulk_load(frames, engine)
 
-    df.to_sql("combined_data", engine, if_exists="replace", index=False)
+    create_filter_indexes()
 
     print("Data has been loaded to PostgreSQL successfully")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()